@@ -2,14 +2,20 @@ import json
 import os
 from datetime import datetime, timedelta
 import time
+from itertools import islice
 from api.yahoo_finance import get_alert_conditions, get_multiple_prices
-from database import insert_alerta, get_alertas, marcar_alerta_leida, get_estadisticas_alertas
+from database import (insert_alerta, get_ultima_alerta, marcar_alerta_leida, get_estadisticas_alertas,
+                      iter_alertas, archivar_alertas, ALERT_RETENTION_DAYS)
 from datetime import datetime
 
 class AlertManager:
     def __init__(self):
         self.alerts_dir = "alerts"
         self.alert_cooldown = 3600  # 1 hora en segundos entre alertas del mismo tipo
+        self.retention_days = ALERT_RETENTION_DAYS  # Días que las alertas leídas siguen en la tabla alertas
+        self.retention_interval = 24 * 3600  # Segundos entre archivados
+        self._last_retention = 0
+        self._listeners = []  # Reciben la lista de alertas de cada revisión del poller
         os.makedirs(self.alerts_dir, exist_ok=True)
     
     def _get_alert_file_path(self, symbol, alert_type):
@@ -19,13 +25,7 @@ class AlertManager:
         """Verificar si ha pasado suficiente tiempo desde la última alerta"""
         try:
             # Buscar la última alerta del mismo tipo para este símbolo
-            alertas = get_alertas(symbol)
-            ultima_alerta = None
-            
-            for alerta in alertas:
-                if alerta[3] == alert_type:  # tipo_alerta está en la posición 3
-                    ultima_alerta = alerta[1]  # fecha está en la posición 1
-                    break
+            ultima_alerta = get_ultima_alerta(symbol, alert_type)
             
             if not ultima_alerta:
                 return True
@@ -63,12 +63,16 @@ class AlertManager:
             print(f"Error registrando alerta en BD: {e}")
             return False
     
-    def check_portfolio_alerts(self, portfolio_symbols):
-        """Verificar alertas para todos los símbolos del portafolio"""
+    def check_portfolio_alerts(self, portfolio_symbols, prices=None):
+        """
+        Verificar alertas para todos los símbolos del portafolio.
+        prices: {simbolo: precio} ya conocidos para no volver a pedirlos
+        """
         alerts = []
+        prices = prices or {}
         
         for symbol in portfolio_symbols:
-            alert_conditions = get_alert_conditions(symbol)
+            alert_conditions = get_alert_conditions(symbol, current_price=prices.get(symbol))
             
             if alert_conditions and alert_conditions['alert_message']:
                 # Verificar cooldown
@@ -79,6 +83,40 @@ class AlertManager:
         
         return alerts
     
+    def add_listener(self, callback):
+        """Registrar callback(alertas), llamado desde el hilo del poller tras cada revisión"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+        return callback
+    
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def on_price_update(self, event):
+        """Suscriptor del poller de precios: revisar solo los símbolos que cambiaron"""
+        changed = {symbol: new for symbol, (old, new) in event['changed'].items()}
+        if not changed:
+            return []
+        alerts = self.check_portfolio_alerts(list(changed), changed)
+        for listener in list(self._listeners):
+            try:
+                listener(alerts)
+            except Exception as e:
+                print(f"Error notificando alertas: {e}")
+        return alerts
+
+    def run_retention(self, event=None, force=False):
+        """
+        Archivar las alertas leídas antiguas como mucho una vez por
+        retention_interval. Puede suscribirse al poller de precios
+        """
+        now = time.time()
+        if not force and now - self._last_retention < self.retention_interval:
+            return None
+        self._last_retention = now
+        return archivar_alertas(self.retention_days)
+    
     def get_alert_stats(self, symbol):
         """Obtener estadísticas de alertas para un símbolo"""
         stats = {
@@ -104,22 +142,23 @@ class AlertManager:
         
         return stats
     
-    def get_alert_stats(self, symbol=None):
-        """Obtener estadísticas de alertas desde la base de datos"""
+    def get_alert_stats(self, symbol=None, history_limit=50):
+        """
+        Obtener estadísticas de alertas desde la base de datos. Los totales
+        salen de alertas_resumen (incluyen las archivadas); alert_history
+        trae solo las history_limit más recientes
+        """
         try:
-            if symbol:
-                alertas = get_alertas(symbol)
-            else:
-                alertas = get_alertas()
-            
+            estadisticas = get_estadisticas_alertas(symbol)
             stats = {
-                'total_alerts': len(alertas),
-                'unread_alerts': len([a for a in alertas if not a[8]]),  # leida está en posición 8
-                'last_alert': max([a[1] for a in alertas]) if alertas else None,  # fecha en posición 1
+                'total_alerts': estadisticas['total'],
+                'unread_alerts': estadisticas['no_leidas'],
+                'archived_alerts': estadisticas['archivadas'],
+                'last_alert': estadisticas['ultima_alerta'],
                 'alert_history': []
             }
             
-            for alerta in alertas:
+            for alerta in islice(iter_alertas(symbol, page_size=history_limit), history_limit):
                 stats['alert_history'].append({
                     'id': alerta[0],
                     'fecha': alerta[1],
@@ -136,7 +175,7 @@ class AlertManager:
             
         except Exception as e:
             print(f"Error obteniendo estadísticas de alertas: {e}")
-            return {'total_alerts': 0, 'unread_alerts': 0, 'last_alert': None, 'alert_history': []}
+            return {'total_alerts': 0, 'unread_alerts': 0, 'archived_alerts': 0, 'last_alert': None, 'alert_history': []}
 
 # Instancia global
 alert_manager = AlertManager()
\ No newline at end of file
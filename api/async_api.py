@@ -0,0 +1,100 @@
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from api.yahoo_finance import yahoo_api, get_historical_data
+
+class AsyncYahooFinanceAPI:
+    """
+    Variantes asyncio de las consultas de precios e históricos.
+    Comparten el cache, el agrupador de peticiones y el limitador de
+    YahooFinanceAPI; las descargas (bloqueantes en yfinance) corren en un
+    pool propio y como máximo max_concurrency a la vez.
+    """
+
+    def __init__(self, api=yahoo_api, max_concurrency=16):
+        self.api = api
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="async-api")
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _get_semaphore(self):
+        """Un semáforo por event loop (asyncio.Semaphore no se comparte entre loops)"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _run(self, func, *args, **kwargs):
+        """Ejecutar una llamada bloqueante respetando el límite de concurrencia"""
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore():
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def get_usd_mxn_rate(self, force_update=False):
+        return await self._run(self.api.get_usd_mxn_rate, force_update)
+
+    async def get_current_price(self, symbol, currency=None):
+        return await self._run(self.api.get_current_price, symbol, currency)
+
+    async def _fetch_price(self, symbol):
+        try:
+            return symbol, await self._run(self.api._fetch_price, symbol)
+        except Exception as e:
+            print(f"Error obteniendo precio de {symbol}: {e}")
+            return symbol, None
+
+    async def get_multiple_prices(self, symbols, currency=None):
+        """
+        Igual que YahooFinanceAPI.get_multiple_prices: cache, una descarga
+        agrupada y el resto de símbolos en paralelo (hasta max_concurrency)
+        """
+        factors_task = None
+        if currency:
+            factors_task = asyncio.ensure_future(
+                self._run(self.api.fx.get_conversion_factors, symbols, currency))
+
+        usd_prices, pending = await self._run(self.api._read_cached_prices, symbols)
+
+        if pending:
+            fetched = await self._run(self.api._fetch_batch_prices, pending)
+            missing = [symbol for symbol in pending if symbol not in fetched]
+            results = await asyncio.gather(*(self._fetch_price(symbol) for symbol in missing))
+            fetched.update({symbol: price for symbol, price in results if price})
+
+            await self._run(self.api._save_cached_prices, fetched)
+            usd_prices.update(fetched)
+
+        factors = await factors_task if factors_task else {}
+        prices = {symbol: usd_prices[symbol] for symbol in symbols if usd_prices.get(symbol) is not None}
+        if currency:
+            # Sin tipo de cambio el precio queda fuera, igual que convert_prices
+            return {symbol: price * factors[symbol] for symbol, price in prices.items()
+                    if factors.get(symbol) is not None}
+        return prices
+
+    async def get_historical_data(self, symbol, period="6mo"):
+        return await self._run(get_historical_data, symbol, period)
+
+    async def get_multiple_historical_data(self, symbols, period="6mo"):
+        results = await asyncio.gather(*(self.get_historical_data(symbol, period) for symbol in symbols))
+        return {symbol: data for symbol, data in zip(symbols, results) if data is not None}
+
+# Instancia global para usar en la aplicación
+async_api = AsyncYahooFinanceAPI()
+
+# Funciones de conveniencia
+async def get_current_price_async(symbol, currency=None):
+    return await async_api.get_current_price(symbol, currency)
+
+async def get_multiple_prices_async(symbols, currency=None):
+    return await async_api.get_multiple_prices(symbols, currency)
+
+async def get_historical_data_async(symbol, period="6mo"):
+    return await async_api.get_historical_data(symbol, period)
+
+async def get_usd_mxn_rate_async(force_update=False):
+    return await async_api.get_usd_mxn_rate(force_update)
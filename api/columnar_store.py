@@ -0,0 +1,228 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['fecha', 'open', 'high', 'low', 'close', 'volume']
+DTYPES = {name: np.int64 if name == 'fecha' else np.float64 for name in COLUMNS}
+# Formato de los archivos de columna; las entradas del índice de otro formato se ignoran
+FORMAT = "bin"
+
+class ColumnarStore:
+    """
+    Histórico en formato columnar: un archivo binario por columna y por
+    (símbolo, intervalo) con los valores en crudo (int64/float64), más un
+    índice JSON pequeño con filas, rango de fechas y zona horaria de cada
+    serie. Las lecturas usan mmap, así que varios procesos comparten las
+    mismas páginas en solo lectura y cargar una serie no requiere parsear nada.
+
+    Como el número de filas vive en el índice, las barras nuevas se agregan
+    al final de los archivos (append) sin reescribir la serie completa.
+
+    Estructura: <base_dir>/<intervalo>/<SIMBOLO>/<columna>.bin y <base_dir>/index.json
+    """
+
+    def __init__(self, base_dir="price_cache/columnar"):
+        self.base_dir = base_dir
+        self.index_path = os.path.join(base_dir, "index.json")
+        self.lock_path = os.path.join(base_dir, "index.lock")
+        self._lock = threading.Lock()
+        os.makedirs(base_dir, exist_ok=True)
+        self._index_stamp = None
+        self._index = self._read_index()
+
+    def _stat_index(self):
+        """(mtime, tamaño, inodo) de index.json o None si no existe"""
+        try:
+            st = os.stat(self.index_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _read_index(self):
+        # La marca se toma antes de leer: si el archivo cambia a la mitad,
+        # la siguiente consulta vuelve a cargarlo
+        self._index_stamp = self._stat_index()
+        if self._index_stamp is None:
+            return {}
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Índice columnar ignorado: {e}")
+            return {}
+
+    @contextmanager
+    def _index_lock(self):
+        """
+        Lock del hilo y de archivo (entre procesos) para leer, modificar y
+        escribir el índice sin perder entradas de otros escritores
+        """
+        with self._lock:
+            with open(self.lock_path, 'a+b') as f:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                    else:
+                        f.seek(0)
+                        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _write_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+        self._index_stamp = self._stat_index()
+
+    @staticmethod
+    def _key(symbol, interval):
+        return f"{interval}/{symbol}"
+
+    def _series_dir(self, symbol, interval):
+        return os.path.join(self.base_dir, interval, symbol)
+
+    def get_info(self, symbol, interval):
+        """Entrada del índice (rows, first, last, tz) o None"""
+        with self._lock:
+            if self._stat_index() != self._index_stamp:
+                # Otro proceso (u otra instancia) reescribió el índice
+                self._index = self._read_index()
+            info = self._index.get(self._key(symbol, interval))
+        return info if info and info.get('format') == FORMAT else None
+
+    def _column_path(self, symbol, interval, name):
+        return os.path.join(self._series_dir(symbol, interval), f"{name}.bin")
+
+    def _update_index(self, symbol, interval, rows, first, last, tz):
+        with self._index_lock():
+            self._index = self._read_index()
+            self._index[self._key(symbol, interval)] = {
+                'rows': int(rows),
+                'first': int(first) if first is not None else None,
+                'last': int(last) if last is not None else None,
+                'tz': tz,
+                'format': FORMAT
+            }
+            self._write_index()
+
+    def write(self, symbol, interval, columns, tz=None):
+        """
+        Escribir una serie completa. columns: {'fecha': epochs int64,
+        'open': ..., 'volume': ...} con arreglos de la misma longitud
+        """
+        directory = self._series_dir(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+
+        fechas = np.asarray(columns['fecha'], dtype=np.int64)
+        for name in COLUMNS:
+            values = np.asarray(columns[name], dtype=DTYPES[name])
+            path = self._column_path(symbol, interval, name)
+            tmp_path = path + ".tmp"
+            values.tofile(tmp_path)
+            # Reemplazo atómico: los lectores con mmap abierto conservan el archivo anterior
+            os.replace(tmp_path, path)
+
+        self._update_index(symbol, interval, len(fechas),
+                           fechas[0] if len(fechas) else None,
+                           fechas[-1] if len(fechas) else None, tz)
+
+    def append(self, symbol, interval, columns, tz=None):
+        """
+        Agregar barras ordenadas al final de una serie existente. Las que
+        coinciden con la cola ya guardada se sobrescriben en su lugar.
+        Devuelve False (sin escribir nada) si la serie no existe o si las
+        barras caen antes de la cola; en ese caso hay que usar write()
+        """
+        info = self.get_info(symbol, interval)
+        fechas = np.asarray(columns['fecha'], dtype=np.int64)
+        if info is None or not info['rows'] or not len(fechas):
+            return False
+        if np.any(np.diff(fechas) <= 0):
+            return False
+
+        existing = np.memmap(self._column_path(symbol, interval, 'fecha'), dtype=np.int64,
+                             mode='r', shape=(info['rows'],))
+        start = int(np.searchsorted(existing, fechas[0], side='left'))
+        overlap = info['rows'] - start
+        if overlap > len(fechas) or not np.array_equal(existing[start:], fechas[:overlap]):
+            return False
+        del existing
+
+        # Primero los datos y después el índice: los lectores solo ven filas completas
+        for name in COLUMNS:
+            values = np.asarray(columns[name], dtype=DTYPES[name])
+            with open(self._column_path(symbol, interval, name), 'r+b') as f:
+                f.seek(start * values.itemsize)
+                values.tofile(f)
+
+        self._update_index(symbol, interval, start + len(fechas), info['first'], fechas[-1],
+                           tz if tz is not None else info.get('tz'))
+        return True
+
+    def load_arrays(self, symbol, interval, since=None):
+        """
+        Arreglos mapeados en memoria (solo lectura, sin copia) desde since (epoch).
+        Devuelve {columna: arreglo} o None si la serie no existe
+        """
+        info = self.get_info(symbol, interval)
+        if info is None:
+            return None
+        try:
+            if info['rows']:
+                arrays = {name: np.memmap(self._column_path(symbol, interval, name), dtype=DTYPES[name],
+                                          mode='r', shape=(info['rows'],))
+                          for name in COLUMNS}
+            else:
+                arrays = {name: np.empty(0, dtype=DTYPES[name]) for name in COLUMNS}
+        except (OSError, ValueError) as e:
+            print(f"Error leyendo histórico columnar de {symbol}: {e}")
+            return None
+
+        if since is not None:
+            start = int(np.searchsorted(arrays['fecha'], since, side='left'))
+            arrays = {name: values[start:] for name, values in arrays.items()}
+        return arrays
+
+    def load_frame(self, symbol, interval, since=None):
+        """Serie como DataFrame OHLCV con índice de fechas (None si no existe)"""
+        arrays = self.load_arrays(symbol, interval, since)
+        if arrays is None:
+            return None
+        info = self.get_info(symbol, interval)
+
+        index = pd.to_datetime(np.asarray(arrays['fecha']), unit='s', utc=True)
+        index = index.tz_convert(info['tz']) if info.get('tz') else index.tz_localize(None)
+        return pd.DataFrame({
+            'Open': arrays['open'],
+            'High': arrays['high'],
+            'Low': arrays['low'],
+            'Close': arrays['close'],
+            'Volume': arrays['volume']
+        }, index=index)
+
+    def remove(self, symbol=None):
+        """Olvidar series del índice (de un símbolo o todas)"""
+        with self._index_lock():
+            self._index = self._read_index()
+            if symbol:
+                self._index = {key: value for key, value in self._index.items()
+                               if key.split("/", 1)[1] != symbol}
+            else:
+                self._index = {}
+            self._write_index()
@@ -0,0 +1,189 @@
+import threading
+import time
+
+# Moneda base: todos los tipos de cambio se piden como USD -> moneda
+BASE_CURRENCY = "USD"
+# Valores de respaldo si nunca se pudo descargar el tipo de cambio
+DEFAULT_RATES = {"MXN": 17.0, "EUR": 0.92}
+# Sufijos de Yahoo Finance -> moneda en la que cotiza el símbolo
+SUFFIX_CURRENCIES = {
+    ".MX": "MXN",
+    ".DE": "EUR", ".F": "EUR", ".PA": "EUR", ".AS": "EUR",
+    ".MC": "EUR", ".MI": "EUR", ".BR": "EUR", ".LS": "EUR"
+}
+# Monedas que Yahoo reporta en subunidades -> (moneda, factor a la moneda)
+MINOR_UNITS = {
+    "GBp": ("GBP", 0.01), "GBX": ("GBP", 0.01),
+    "ZAc": ("ZAR", 0.01), "ZAC": ("ZAR", 0.01),
+    "ILA": ("ILS", 0.01)
+}
+
+def normalize_currency(currency):
+    """(moneda, escala) de una moneda de Yahoo; GBp -> ("GBP", 0.01)"""
+    currency = str(currency)
+    if currency in MINOR_UNITS:
+        return MINOR_UNITS[currency]
+    return currency.upper(), 1.0
+
+def fx_pair(currency):
+    """Símbolo de Yahoo Finance del tipo de cambio USD -> currency"""
+    return f"{BASE_CURRENCY}{currency.upper()}=X"
+
+class FXService:
+    """
+    Tipos de cambio entre cualquier par de monedas.
+
+    Solo se descargan las tasas base USD -> moneda (una por moneda y por
+    ciclo de cache_duration) y los cruzados salen de la matriz:
+    tasa(A -> B) = tasa(USD -> B) / tasa(USD -> A).
+
+    La moneda nativa de cada símbolo viene de la metadata guardada
+    ('currency'), de set_native_currencies o, si no se conoce, del sufijo
+    del símbolo (.MX -> MXN, .DE -> EUR, ... y USD por defecto). Las
+    cotizaciones en subunidades (GBp, ZAc, ILA) se pasan a la moneda con
+    get_unit_scale.
+
+    Si una tasa nunca se pudo descargar y no hay valor de respaldo, la
+    tasa es None y los precios en esa moneda quedan sin convertir.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self._lock = threading.Lock()
+        self._rates = {BASE_CURRENCY: 1.0}  # moneda -> unidades por 1 USD
+        self._rate_times = {}
+        self._native = {}  # simbolo -> moneda en la que cotiza
+        self._scale = {}  # simbolo -> factor de subunidad a moneda (GBp: 0.01)
+
+    # Moneda nativa
+
+    def set_native_currencies(self, currencies):
+        """Registrar {simbolo: moneda} conocidas de antemano"""
+        with self._lock:
+            for symbol, currency in currencies.items():
+                if currency:
+                    self._native[symbol], self._scale[symbol] = normalize_currency(currency)
+
+    def get_native_currency(self, symbol):
+        """Moneda en la que cotiza el símbolo (sin consultar al proveedor)"""
+        with self._lock:
+            currency = self._native.get(symbol)
+        if currency:
+            return currency
+
+        currency, scale = None, 1.0
+        try:
+            info = self.api.quote_store.get_metadata(symbol, float('inf'))
+            if info and info.get('currency'):
+                currency, scale = normalize_currency(info['currency'])
+        except Exception as e:
+            print(f"Error leyendo moneda de {symbol}: {e}")
+
+        if currency is None:
+            currency = self._currency_from_symbol(symbol)
+
+        with self._lock:
+            self._native[symbol] = currency
+            self._scale[symbol] = scale
+        return currency
+
+    def get_unit_scale(self, symbol):
+        """Factor para pasar el precio del símbolo a su moneda nativa (GBp: 0.01)"""
+        self.get_native_currency(symbol)
+        with self._lock:
+            return self._scale.get(symbol, 1.0)
+
+    @staticmethod
+    def _currency_from_symbol(symbol):
+        if symbol.endswith("=X") and len(symbol) == 8:
+            return symbol[3:6]
+        for suffix, currency in SUFFIX_CURRENCIES.items():
+            if symbol.endswith(suffix):
+                return currency
+        return BASE_CURRENCY
+
+    # Tasas base y cruzados
+
+    def _is_fresh(self, currency, now):
+        fetched_at = self._rate_times.get(currency)
+        return fetched_at is not None and now - fetched_at < self.api.cache_duration
+
+    def get_rates(self, currencies, force_update=False):
+        """
+        Tasas USD -> moneda para las monedas pedidas. Las que vencieron se
+        descargan juntas en una sola petición agrupada
+        """
+        currencies = {currency.upper() for currency in currencies} - {BASE_CURRENCY}
+        now = time.time()
+        with self._lock:
+            stale = sorted(currency for currency in currencies
+                           if force_update or not self._is_fresh(currency, now))
+
+        if stale:
+            pairs = {fx_pair(currency): currency for currency in stale}
+            try:
+                prices = self.api.get_native_prices(list(pairs))
+            except Exception as e:
+                print(f"Error obteniendo tipos de cambio: {e}")
+                prices = {}
+
+            with self._lock:
+                for pair, currency in pairs.items():
+                    rate = prices.get(pair)
+                    if rate:
+                        self._rates[currency] = rate
+                        print(f"💰 Tipo de cambio {BASE_CURRENCY}/{currency} actualizado: {rate:.4f}")
+                    else:
+                        # Se conserva la última tasa conocida hasta el siguiente ciclo
+                        print(f"Error obteniendo tipo de cambio {BASE_CURRENCY}/{currency}, se usa el último valor")
+                    self._rate_times[currency] = now
+
+        with self._lock:
+            rates = {BASE_CURRENCY: 1.0}
+            for currency in currencies:
+                rates[currency] = self._rates.get(currency, DEFAULT_RATES.get(currency))
+                if rates[currency] is None:
+                    print(f"Warning: Sin tipo de cambio {BASE_CURRENCY}/{currency}, no se convierten esos precios")
+            return rates
+
+    @staticmethod
+    def _cross(rates, source, target):
+        if rates[source] is None or rates[target] is None:
+            return None
+        return rates[target] / rates[source]
+
+    def get_rate(self, from_currency, to_currency, force_update=False):
+        """Unidades de to_currency por 1 unidad de from_currency (None si no hay tasa)"""
+        from_currency, to_currency = from_currency.upper(), to_currency.upper()
+        if from_currency == to_currency:
+            return 1.0
+        rates = self.get_rates([from_currency, to_currency], force_update)
+        return self._cross(rates, from_currency, to_currency)
+
+    def get_matrix(self, currencies):
+        """Matriz de cruzados {(origen, destino): tasa} con una descarga por moneda"""
+        rates = self.get_rates(currencies)
+        currencies = [currency.upper() for currency in currencies]
+        return {(source, target): self._cross(rates, source, target)
+                for source in currencies for target in currencies}
+
+    def get_conversion_factors(self, symbols, currency):
+        """
+        {simbolo: factor} para pasar el precio nativo de cada símbolo a
+        currency (incluye la escala de subunidades). El factor es None si
+        falta alguna de las tasas. Todas se obtienen de una vez
+        """
+        currency = currency.upper()
+        natives = {symbol: self.get_native_currency(symbol) for symbol in symbols}
+        rates = self.get_rates(set(natives.values()) | {currency})
+        factors = {}
+        for symbol, native in natives.items():
+            rate = 1.0 if native == currency else self._cross(rates, native, currency)
+            factors[symbol] = None if rate is None else rate * self.get_unit_scale(symbol)
+        return factors
+
+    def convert_prices(self, prices, currency):
+        """Convertir {simbolo: precio nativo} a currency; sin tasa el precio queda fuera"""
+        factors = self.get_conversion_factors(list(prices), currency)
+        return {symbol: price * factors[symbol] for symbol, price in prices.items()
+                if factors[symbol] is not None}
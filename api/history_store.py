@@ -0,0 +1,285 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from api.columnar_store import ColumnarStore
+from api.providers import period_to_days, interval_seconds, SESSION_PERIODS
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+EPOCH = pd.Timestamp(0, tz='UTC')
+
+def is_intraday(interval):
+    return interval_seconds(interval) < 86400
+
+class HistoryStore:
+    """
+    Histórico OHLCV persistente por (símbolo, intervalo).
+    La primera vez se descarga el periodo completo; después solo se pide
+    la cola desde la última barra guardada y el resto se sirve localmente.
+
+    Solo se guardan en disco las barras cerradas (una barra de 15m es final
+    cuando terminan sus 15 minutos). La barra en formación se guarda en
+    memoria y se vuelve a pedir cuando cierra una barra o pasan min_refresh
+    segundos, lo que ocurra primero.
+
+    SQLite es la fuente de verdad; las barras cerradas se copian además a un
+    ColumnarStore (arreglos NumPy mapeados en memoria) desde el que se leen.
+    """
+
+    def __init__(self, db_path="price_cache/history.db", min_refresh=60):
+        self.db_path = db_path
+        self.min_refresh = min_refresh  # Vigencia máxima de la barra en formación
+        self._lock = threading.Lock()
+        self._forming = {}  # (simbolo, intervalo) -> DataFrame con la barra en formación
+        self.columnar = ColumnarStore(os.path.join(os.path.dirname(db_path) or ".", "columnar"))
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS barras (
+                simbolo TEXT NOT NULL,
+                intervalo TEXT NOT NULL,
+                fecha INTEGER NOT NULL,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                volume REAL,
+                PRIMARY KEY (simbolo, intervalo, fecha)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS historial_estado (
+                simbolo TEXT NOT NULL,
+                intervalo TEXT NOT NULL,
+                inicio INTEGER NOT NULL,
+                actualizado REAL NOT NULL,
+                zona_horaria TEXT,
+                PRIMARY KEY (simbolo, intervalo)
+            )
+        """)
+        self._conn.commit()
+
+    def _get_state(self, symbol, interval):
+        row = self._conn.execute(
+            "SELECT inicio, actualizado, zona_horaria FROM historial_estado WHERE simbolo=? AND intervalo=?",
+            (symbol, interval)
+        ).fetchone()
+        return row
+
+    def _last_bar(self, symbol, interval):
+        row = self._conn.execute(
+            "SELECT MAX(fecha) FROM barras WHERE simbolo=? AND intervalo=?",
+            (symbol, interval)
+        ).fetchone()
+        return row[0] if row else None
+
+    def save_bars(self, symbol, interval, data, start=None):
+        """
+        Guardar las barras de un DataFrame OHLCV. start (epoch) indica desde
+        cuándo el histórico guardado está completo.
+        """
+        now = time.time()
+        tz = None
+        rows = []
+        forming = None
+
+        if data is not None and not data.empty:
+            index = data.index
+            tz = str(index.tz) if index.tz is not None else None
+            if index.tz is None:
+                index = index.tz_localize('UTC')
+            epochs = ((index.tz_convert('UTC') - EPOCH) // pd.Timedelta(seconds=1)).to_numpy()
+
+            # Las barras que todavía no cierran no se guardan en disco
+            closed = epochs + interval_seconds(interval) <= now
+            if not closed.all():
+                forming = data.loc[~closed].reindex(columns=OHLCV_COLUMNS)
+
+            frame = data.reindex(columns=OHLCV_COLUMNS)
+            rows = [
+                (symbol, interval, int(epoch), *[None if pd.isna(v) else float(v) for v in values])
+                for epoch, values, is_closed in zip(epochs, frame.itertuples(index=False, name=None), closed)
+                if is_closed
+            ]
+
+        if forming is not None:
+            self._forming[(symbol, interval)] = forming
+        else:
+            self._forming.pop((symbol, interval), None)
+
+        with self._conn:
+            if rows:
+                self._conn.executemany(
+                    """INSERT OR REPLACE INTO barras(simbolo, intervalo, fecha, open, high, low, close, volume)
+                       VALUES(?,?,?,?,?,?,?,?)""",
+                    rows
+                )
+            state = self._get_state(symbol, interval)
+            if state is None:
+                self._conn.execute(
+                    "INSERT INTO historial_estado(simbolo, intervalo, inicio, actualizado, zona_horaria) VALUES(?,?,?,?,?)",
+                    (symbol, interval, int(start if start is not None else now), now, tz)
+                )
+            else:
+                inicio = min(state[0], int(start)) if start is not None else state[0]
+                self._conn.execute(
+                    """UPDATE historial_estado SET inicio=?, actualizado=?, zona_horaria=COALESCE(?, zona_horaria)
+                       WHERE simbolo=? AND intervalo=?""",
+                    (inicio, now, tz, symbol, interval)
+                )
+
+        if rows:
+            self._export_columnar(symbol, interval, rows, tz)
+
+    def _export_columnar(self, symbol, interval, rows=None, tz=None):
+        """
+        Copiar las barras cerradas al formato columnar. Si las nuevas (rows)
+        solo extienden la cola se agregan al final; si no, se reescribe la
+        serie completa desde SQLite
+        """
+        try:
+            if rows:
+                rows = sorted(rows, key=lambda row: row[2])
+                values = np.array([row[3:] for row in rows], dtype=np.float64).reshape(-1, 5)
+                columns = {
+                    'fecha': np.array([row[2] for row in rows], dtype=np.int64),
+                    'open': values[:, 0], 'high': values[:, 1], 'low': values[:, 2],
+                    'close': values[:, 3], 'volume': values[:, 4]
+                }
+                # Si la copia ya estaba desfasada de SQLite se reescribe completa
+                if self.columnar.append(symbol, interval, columns, tz) and self._columnar_is_current(symbol, interval):
+                    return
+
+            state = self._get_state(symbol, interval)
+            rows = self._conn.execute(
+                """SELECT fecha, open, high, low, close, volume FROM barras
+                   WHERE simbolo=? AND intervalo=? ORDER BY fecha""",
+                (symbol, interval)
+            ).fetchall()
+            values = np.array(rows, dtype=np.float64).reshape(-1, 6)
+            columns = {
+                'fecha': np.array([row[0] for row in rows], dtype=np.int64),
+                'open': values[:, 1], 'high': values[:, 2], 'low': values[:, 3],
+                'close': values[:, 4], 'volume': values[:, 5]
+            }
+            self.columnar.write(symbol, interval, columns, state[2] if state else None)
+        except Exception as e:
+            print(f"Error exportando histórico columnar de {symbol}: {e}")
+
+    def _columnar_is_current(self, symbol, interval):
+        """¿La copia columnar tiene las mismas barras que SQLite?"""
+        info = self.columnar.get_info(symbol, interval)
+        if info is None:
+            return False
+        first, last, rows = self._conn.execute(
+            "SELECT MIN(fecha), MAX(fecha), COUNT(*) FROM barras WHERE simbolo=? AND intervalo=?",
+            (symbol, interval)
+        ).fetchone()
+        return (info['first'], info['last'], info['rows']) == (first, last, rows)
+
+    def load_bars(self, symbol, interval, since=None):
+        """
+        Leer las barras guardadas (desde since, epoch) como DataFrame.
+        Se usa la copia columnar (mmap) si está al día; si no, SQLite
+        """
+        frame = None
+        if self._columnar_is_current(symbol, interval):
+            frame = self.columnar.load_frame(symbol, interval, since)
+
+        if frame is None:
+            state = self._get_state(symbol, interval)
+            rows = self._conn.execute(
+                """SELECT fecha, open, high, low, close, volume FROM barras
+                   WHERE simbolo=? AND intervalo=? AND fecha>=? ORDER BY fecha""",
+                (symbol, interval, int(since or 0))
+            ).fetchall()
+
+            frame = pd.DataFrame(rows, columns=['fecha'] + OHLCV_COLUMNS)
+            index = pd.to_datetime(frame.pop('fecha'), unit='s', utc=True)
+            tz = state[2] if state else None
+            index = index.dt.tz_convert(tz) if tz else index.dt.tz_localize(None)
+            frame.index = pd.DatetimeIndex(index)
+
+        frame.index.name = 'Datetime' if is_intraday(interval) else 'Date'
+
+        forming = self._forming.get((symbol, interval))
+        if forming is not None and not forming.empty:
+            forming = forming[~forming.index.isin(frame.index)]
+            forming.index.name = frame.index.name
+            frame = pd.concat([frame, forming]) if not frame.empty else forming
+        return frame
+
+    def _needs_refresh(self, state, interval, now):
+        """
+        La cola se vuelve a pedir si cerró una barra desde la última
+        sincronización o si la barra en formación tiene más de min_refresh segundos
+        """
+        step = interval_seconds(interval)
+        synced = state[1]
+        if int(now // step) > int(synced // step):
+            return True
+        return now - synced >= min(self.min_refresh, step)
+
+    def get_history(self, symbol, period, interval, fetch):
+        """
+        Devolver el histórico de symbol para period/interval.
+        fetch(symbol, period=..., interval=..., start=...) descarga del proveedor.
+        """
+        # 1d y 5d son días de mercado: se busca más atrás y se recorta al final
+        days = period_to_days(period) + (3 if period in SESSION_PERIODS else 0)
+        since = int((datetime.now() - timedelta(days=days)).timestamp())
+
+        with self._lock:
+            state = self._get_state(symbol, interval)
+            last_bar = self._last_bar(symbol, interval)
+
+        if state is None or state[0] > since or last_bar is None:
+            # No hay histórico suficiente: descarga completa del periodo
+            data = fetch(symbol, period=period, interval=interval)
+            with self._lock:
+                self.save_bars(symbol, interval, data, start=since)
+        elif self._needs_refresh(state, interval, time.time()):
+            # Solo lo posterior a la última barra cerrada (incluye la barra en formación)
+            start = pd.Timestamp(last_bar + interval_seconds(interval), unit='s', tz='UTC')
+            if state[2]:
+                start = start.tz_convert(state[2])
+            if not is_intraday(interval):
+                start = start.strftime('%Y-%m-%d')
+            try:
+                data = fetch(symbol, interval=interval, start=start)
+                with self._lock:
+                    self.save_bars(symbol, interval, data)
+            except Exception as e:
+                # Se sirve lo que ya está guardado
+                print(f"Error actualizando histórico de {symbol}: {e}")
+
+        with self._lock:
+            bars = self.load_bars(symbol, interval, since)
+
+        if period in SESSION_PERIODS and not bars.empty:
+            sessions = bars.index.normalize().unique()[-SESSION_PERIODS[period]:]
+            bars = bars[bars.index.normalize().isin(sessions)]
+        return bars
+
+    def clear(self, symbol=None):
+        """Borrar el histórico guardado (de un símbolo o completo)"""
+        with self._lock:
+            with self._conn:
+                if symbol:
+                    self._conn.execute("DELETE FROM barras WHERE simbolo=?", (symbol,))
+                    self._conn.execute("DELETE FROM historial_estado WHERE simbolo=?", (symbol,))
+                else:
+                    self._conn.execute("DELETE FROM barras")
+                    self._conn.execute("DELETE FROM historial_estado")
+            self.columnar.remove(symbol)
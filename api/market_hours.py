@@ -0,0 +1,131 @@
+from datetime import datetime, time as dtime, timedelta
+
+import pandas as pd
+from pandas.tseries.holiday import (AbstractHolidayCalendar, Holiday, GoodFriday, USMartinLutherKingJr,
+                                    USPresidentsDay, USMemorialDay, USLaborDay, USThanksgivingDay,
+                                    nearest_workday, sunday_to_monday)
+from pandas.tseries.offsets import DateOffset, Day, Easter
+from dateutil.relativedelta import MO
+
+# Tipos de activos (tabla activos) que no cotizan en Yahoo Finance
+FIXED_INCOME_TYPES = ('cetes', 'otro_fija')
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    """Días feriados de NYSE (reglas vigentes; sin cierres extraordinarios)"""
+    rules = [
+        # Si el 1 de enero cae en sábado no se recorre al viernes
+        Holiday("Año Nuevo", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-01-01", observance=nearest_workday),
+        Holiday("Día de la Independencia", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Navidad", month=12, day=25, observance=nearest_workday)
+    ]
+
+class BMVHolidayCalendar(AbstractHolidayCalendar):
+    """Días inhábiles de la BMV (los feriados que caen en fin de semana no se recorren)"""
+    rules = [
+        Holiday("Año Nuevo", month=1, day=1),
+        Holiday("Día de la Constitución", month=2, day=1, offset=DateOffset(weekday=MO(1))),
+        Holiday("Natalicio de Benito Juárez", month=3, day=15, offset=DateOffset(weekday=MO(1))),
+        Holiday("Jueves Santo", month=1, day=1, offset=[Easter(), Day(-3)]),
+        Holiday("Viernes Santo", month=1, day=1, offset=[Easter(), Day(-2)]),
+        Holiday("Día del Trabajo", month=5, day=1),
+        Holiday("Día de la Independencia", month=9, day=16),
+        Holiday("Día de la Revolución", month=11, day=15, offset=DateOffset(weekday=MO(1))),
+        Holiday("Día de la Virgen de Guadalupe", month=12, day=12),
+        Holiday("Navidad", month=12, day=25)
+    ]
+
+class Market:
+    """Horario regular de una bolsa en su zona horaria local"""
+
+    def __init__(self, name, tz, open_time, close_time, weekdays=range(5), holidays=(), calendar=None):
+        self.name = name
+        self.tz = tz
+        self.open_time = open_time
+        self.close_time = close_time
+        self.weekdays = set(weekdays)
+        self.holidays = set(holidays)  # Fechas (datetime.date) sin sesión además del calendario
+        self.calendar = calendar  # AbstractHolidayCalendar con los feriados por regla
+        self._calendar_years = {}  # año -> fechas feriadas ya calculadas
+
+    def _local(self, timestamp):
+        return pd.Timestamp(timestamp, unit='s', tz='UTC').tz_convert(self.tz)
+
+    def _calendar_holidays(self, year):
+        if self.calendar is None:
+            return frozenset()
+        holidays = self._calendar_years.get(year)
+        if holidays is None:
+            dates = self.calendar.holidays(start=f"{year}-01-01", end=f"{year}-12-31")
+            holidays = frozenset(date.date() for date in dates)
+            self._calendar_years[year] = holidays
+        return holidays
+
+    def _is_trading_day(self, day):
+        return (day.weekday() in self.weekdays and day not in self.holidays
+                and day not in self._calendar_holidays(day.year))
+
+    def is_open(self, timestamp):
+        """¿La bolsa está en sesión en el instante timestamp (epoch)?"""
+        local = self._local(timestamp)
+        if not self._is_trading_day(local.date()):
+            return False
+        return self.open_time <= local.time() < self.close_time
+
+    def next_open(self, timestamp):
+        """Epoch de la siguiente apertura posterior a timestamp"""
+        local = self._local(timestamp)
+        day = local.date()
+        for _ in range(15):
+            if self._is_trading_day(day):
+                opening = pd.Timestamp(datetime.combine(day, self.open_time)).tz_localize(self.tz)
+                if opening > local:
+                    return opening.timestamp()
+            day += timedelta(days=1)
+        return timestamp + 24 * 3600
+
+NYSE = Market("NYSE", "America/New_York", dtime(9, 30), dtime(16, 0), calendar=NYSEHolidayCalendar())
+BMV = Market("BMV", "America/Mexico_City", dtime(8, 30), dtime(15, 0), calendar=BMVHolidayCalendar())
+# Divisas: de lunes a viernes todo el día (aproximado)
+FX = Market("FX", "America/New_York", dtime(0, 0), dtime.max)
+
+def market_for_symbol(symbol):
+    """Bolsa según el sufijo de Yahoo Finance (NYSE por defecto)"""
+    if symbol.endswith("=X"):
+        return FX
+    if symbol.endswith(".MX"):
+        return BMV
+    return NYSE
+
+class MarketHoursPolicy:
+    """
+    Vigencia de los precios en cache según el horario de mercado y el tipo
+    de activo:
+    - Un precio descargado con el mercado cerrado vale hasta la siguiente apertura.
+    - Con el mercado abierto vale open_ttl segundos.
+    - Las criptomonedas cotizan 24/7 y usan crypto_ttl.
+    - La renta fija (cetes, otro_fija) no se consulta.
+    """
+
+    def __init__(self, crypto_ttl=60):
+        self.crypto_ttl = crypto_ttl
+
+    def is_polled(self, asset_type):
+        """¿Se deben pedir precios para este tipo de activo?"""
+        return asset_type not in FIXED_INCOME_TYPES
+
+    def expires_at(self, symbol, fetched_at, open_ttl, asset_type=None):
+        """Epoch en el que vence un precio descargado en fetched_at"""
+        if asset_type == 'cripto' or (asset_type is None and symbol.endswith("-USD")):
+            return fetched_at + self.crypto_ttl
+
+        market = market_for_symbol(symbol)
+        if not market.is_open(fetched_at):
+            return max(market.next_open(fetched_at), fetched_at + open_ttl)
+        return fetched_at + open_ttl
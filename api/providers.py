@@ -0,0 +1,269 @@
+import json
+import os
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Días aproximados por periodo de Yahoo Finance
+PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 31, "3mo": 92, "6mo": 183,
+    "1y": 366, "2y": 731, "5y": 1827, "10y": 3653, "max": 36525
+}
+
+# Periodos que Yahoo cuenta en sesiones de mercado y no en días naturales
+SESSION_PERIODS = {"1d": 1, "5d": 5}
+
+# Duración de cada barra en segundos
+INTERVAL_SECONDS = {
+    "1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800,
+    "60m": 3600, "1h": 3600, "90m": 5400,
+    "1d": 86400, "5d": 5 * 86400, "1wk": 7 * 86400, "1mo": 31 * 86400, "3mo": 92 * 86400
+}
+
+def interval_seconds(interval):
+    """Duración de una barra del intervalo (1d por defecto)"""
+    return INTERVAL_SECONDS.get(interval, 86400)
+
+def period_to_days(period):
+    """Convierte un periodo de Yahoo Finance (1mo, 6mo, ytd...) a días"""
+    if period == "ytd":
+        today = datetime.now()
+        return (today - datetime(today.year, 1, 1)).days + 1
+    return PERIOD_DAYS.get(period, 183)
+
+class PriceProvider:
+    """Clase base para los proveedores de precios"""
+
+    name = "base"
+    supports_batch = False
+
+    def get_quote(self, symbol):
+        """Precio actual de un símbolo (float o None)"""
+        raise NotImplementedError("Método get_quote debe ser implementado")
+
+    def get_quotes(self, symbols):
+        """
+        Precios actuales de varios símbolos en una sola petición.
+        Los símbolos sin datos no aparecen en el resultado.
+        """
+        return {}
+
+    def get_history(self, symbol, period="6mo", interval="1d", start=None):
+        """DataFrame OHLCV; si se indica start se ignora period"""
+        raise NotImplementedError("Método get_history debe ser implementado")
+
+    def get_info(self, symbol):
+        """Diccionario con la información descriptiva del símbolo"""
+        raise NotImplementedError("Método get_info debe ser implementado")
+
+class YFinanceProvider(PriceProvider):
+    """Proveedor en línea basado en yfinance"""
+
+    name = "yfinance"
+    supports_batch = True
+    # yf.download hace una petición por símbolo; máximo de hilos simultáneos
+    max_threads = 8
+
+    def get_quote(self, symbol):
+        """Solo el precio (fast_info), sin descargar el bloque completo de ticker.info"""
+        import yfinance as yf
+
+        ticker = yf.Ticker(symbol)
+        try:
+            current_price = ticker.fast_info.last_price or 0
+        except Exception:
+            current_price = 0
+
+        if not current_price:
+            hist = ticker.history(period="1d")
+            if not hist.empty:
+                current_price = hist['Close'].iloc[-1]
+
+        return current_price
+
+    def get_quotes(self, symbols):
+        import yfinance as yf
+
+        prices = {}
+        if len(symbols) < 2:
+            return prices
+
+        data = yf.download(
+            tickers=" ".join(symbols),
+            period="5d",
+            interval="1d",
+            group_by="ticker",
+            threads=min(len(symbols), self.max_threads),
+            progress=False
+        )
+
+        if data is None or data.empty:
+            return prices
+
+        for symbol in symbols:
+            try:
+                closes = data[symbol]['Close'].dropna()
+            except KeyError:
+                continue
+            if not closes.empty and closes.iloc[-1] > 0:
+                prices[symbol] = float(closes.iloc[-1])
+
+        return prices
+
+    def get_history(self, symbol, period="6mo", interval="1d", start=None):
+        import yfinance as yf
+
+        ticker = yf.Ticker(symbol)
+        if start is not None:
+            return ticker.history(start=start, interval=interval)
+        return ticker.history(period=period, interval=interval)
+
+    def get_info(self, symbol):
+        import yfinance as yf
+
+        return yf.Ticker(symbol).info
+
+class ReplayProvider(PriceProvider):
+    """
+    Proveedor sin red que sirve precios e históricos desde archivos locales.
+
+    - Precios: <data_dir>/<SIMBOLO>.json con la clave 'price' (mismo formato
+      que los archivos de price_cache).
+    - Histórico: <data_dir>/<SIMBOLO>_<intervalo>.csv o <data_dir>/<SIMBOLO>.csv
+      con columnas Open, High, Low, Close, Volume y la fecha como índice.
+
+    Si no hay histórico se genera una caminata aleatoria determinista que
+    termina en el precio guardado. latency (segundos) y error_rate (0 a 1)
+    simulan la latencia y los fallos de la red.
+    """
+
+    name = "replay"
+    supports_batch = True
+
+    def __init__(self, data_dir="replay_data", latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.data_dir = data_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def _simulate_network(self, symbol):
+        """Aplica la latencia y los errores configurados"""
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise ConnectionError(f"Error simulado obteniendo {symbol}")
+
+    def _load_quote(self, symbol):
+        path = os.path.join(self.data_dir, f"{symbol}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f).get('price')
+
+    def get_quote(self, symbol):
+        self._simulate_network(symbol)
+        price = self._load_quote(symbol)
+        if price is None:
+            hist = self._load_history(symbol, "1d")
+            if hist is not None and not hist.empty:
+                price = float(hist['Close'].iloc[-1])
+        return price
+
+    def get_quotes(self, symbols):
+        self._simulate_network(",".join(symbols))
+        prices = {}
+        for symbol in symbols:
+            price = self._load_quote(symbol)
+            if price:
+                prices[symbol] = price
+        return prices
+
+    def _load_history(self, symbol, interval):
+        for filename in (f"{symbol}_{interval}.csv", f"{symbol}.csv"):
+            path = os.path.join(self.data_dir, filename)
+            if os.path.exists(path):
+                return pd.read_csv(path, index_col=0, parse_dates=True)
+        return None
+
+    def _synthetic_history(self, symbol, days, interval="1d"):
+        """Caminata aleatoria reproducible por símbolo"""
+        last_price = self._load_quote(symbol) or 100.0
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+
+        sessions = pd.bdate_range(end=datetime.now().date(), periods=max(int(days * 5 / 7), 1))
+        step = interval_seconds(interval)
+        if step < 86400:
+            # Barras intradía dentro de la sesión regular (9:30 a 16:00)
+            dates = pd.DatetimeIndex(np.concatenate([
+                pd.date_range(day + pd.Timedelta(hours=9, minutes=30), day + pd.Timedelta(hours=16),
+                              freq=f"{step}s", inclusive="left").to_numpy()
+                for day in sessions
+            ]))
+            dates = dates[dates <= pd.Timestamp(datetime.now())]
+        else:
+            dates = sessions
+        returns = rng.normal(0.0005, 0.02, len(dates))
+        closes = last_price * np.exp(np.cumsum(returns) - np.sum(returns))
+        opens = closes * (1 + rng.normal(0, 0.005, len(dates)))
+
+        return pd.DataFrame({
+            'Open': opens,
+            'High': np.maximum(opens, closes) * (1 + np.abs(rng.normal(0, 0.01, len(dates)))),
+            'Low': np.minimum(opens, closes) * (1 - np.abs(rng.normal(0, 0.01, len(dates)))),
+            'Close': closes,
+            'Volume': rng.integers(1_000_000, 50_000_000, len(dates))
+        }, index=dates)
+
+    def get_history(self, symbol, period="6mo", interval="1d", start=None):
+        self._simulate_network(symbol)
+
+        hist = self._load_history(symbol, interval)
+        if hist is None:
+            if start is not None:
+                start_ts = pd.Timestamp(start)
+                days = (pd.Timestamp.now(tz=start_ts.tz) - start_ts).days + 1
+            else:
+                days = period_to_days(period) + (3 if period in SESSION_PERIODS else 0)
+            hist = self._synthetic_history(symbol, days, interval)
+
+        if start is not None:
+            start = pd.Timestamp(start)
+            if start.tz is not None and hist.index.tz is None:
+                start = start.tz_localize(None)
+            return hist[hist.index >= start]
+
+        if period in SESSION_PERIODS and not hist.empty:
+            sessions = hist.index.normalize().unique()[-SESSION_PERIODS[period]:]
+            return hist[hist.index.normalize().isin(sessions)]
+
+        since = pd.Timestamp(datetime.now() - timedelta(days=period_to_days(period)))
+        return hist[hist.index >= since]
+
+    def get_info(self, symbol):
+        self._simulate_network(symbol)
+        price = self._load_quote(symbol)
+        if price is None:
+            return {}
+        return {'symbol': symbol, 'shortName': symbol, 'currency': 'USD', 'regularMarketPrice': price}
+
+def create_provider(name=None, **kwargs):
+    """
+    Crear un proveedor por nombre. Sin nombre se usa la variable de entorno
+    TRADER_PRICE_PROVIDER (por defecto yfinance); el proveedor replay lee
+    TRADER_REPLAY_DIR, TRADER_REPLAY_LATENCY y TRADER_REPLAY_ERROR_RATE.
+    """
+    name = (name or os.environ.get("TRADER_PRICE_PROVIDER", "yfinance")).lower()
+
+    if name == "replay":
+        kwargs.setdefault("data_dir", os.environ.get("TRADER_REPLAY_DIR", "replay_data"))
+        kwargs.setdefault("latency", float(os.environ.get("TRADER_REPLAY_LATENCY", 0)))
+        kwargs.setdefault("error_rate", float(os.environ.get("TRADER_REPLAY_ERROR_RATE", 0)))
+        return ReplayProvider(**kwargs)
+
+    return YFinanceProvider()
@@ -0,0 +1,177 @@
+import threading
+import time
+from datetime import datetime
+
+from api.yahoo_finance import yahoo_api
+
+class QuotePoller:
+    """
+    Servicio en segundo plano que actualiza los precios de los símbolos
+    vigilados cada interval segundos y publica los cambios a los suscriptores.
+
+    Cada ciclo hace una sola consulta agrupada (get_native_prices, que pasa
+    por el cache), así que el tráfico hacia el proveedor no depende de
+    cuántas ventanas o consumidores haya. Los suscriptores reciben un evento
+    {'timestamp', 'prices': {simbolo: precio}, 'changed': {simbolo: (anterior, nuevo)}}
+    desde el hilo del poller; las ventanas Qt deben reenviarlo con una señal.
+    """
+
+    def __init__(self, api=yahoo_api, interval=300):
+        self.api = api
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._symbols = set()
+        self._subscribers = []
+        self._last_prices = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    # Símbolos vigilados
+
+    def watch(self, symbols):
+        """Agregar símbolos a la lista de vigilancia"""
+        with self._lock:
+            new = set(symbols) - self._symbols
+            self._symbols.update(new)
+        if new:
+            # Tipos de los activos recién agregados: la renta fija no se consulta
+            self.api.load_asset_types()
+        if new and self.is_running():
+            self.refresh_now()
+
+    def unwatch(self, symbols):
+        with self._lock:
+            self._symbols.difference_update(symbols)
+            for symbol in symbols:
+                self._last_prices.pop(symbol, None)
+
+    def get_watched(self):
+        with self._lock:
+            return sorted(self._symbols)
+
+    # Suscripciones
+
+    def subscribe(self, callback):
+        """Registrar callback(evento); se llama en cada ciclo con precios"""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def get_last_price(self, symbol):
+        """Último precio publicado (None si aún no hay)"""
+        with self._lock:
+            return self._last_prices.get(symbol)
+
+    def get_last_prices(self):
+        with self._lock:
+            return dict(self._last_prices)
+
+    # Ciclo de actualización
+
+    def poll_once(self):
+        """Actualizar todos los símbolos vigilados y publicar el evento"""
+        symbols = self.get_watched()
+        if not symbols:
+            return None
+
+        try:
+            prices = self.api.get_native_prices(symbols)
+        except Exception as e:
+            print(f"Error actualizando precios en segundo plano: {e}")
+            return None
+
+        with self._lock:
+            changed = {symbol: (self._last_prices.get(symbol), price)
+                       for symbol, price in prices.items()
+                       if self._last_prices.get(symbol) != price}
+            self._last_prices.update(prices)
+            subscribers = list(self._subscribers)
+
+        event = {'timestamp': time.time(), 'prices': prices, 'changed': changed}
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error en suscriptor de precios {getattr(callback, '__name__', callback)}: {e}")
+        return event
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll_once()
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def start(self):
+        """Iniciar el hilo del poller (no hace nada si ya corre)"""
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="quote-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def refresh_now(self):
+        """Adelantar el siguiente ciclo"""
+        self._wakeup.set()
+
+class PriceLogger:
+    """Suscriptor sin interfaz: imprime los cambios y opcionalmente los agrega a un CSV"""
+
+    def __init__(self, csv_path=None):
+        self.csv_path = csv_path
+
+    def __call__(self, event):
+        fecha = datetime.fromtimestamp(event['timestamp']).strftime("%Y-%m-%d %H:%M:%S")
+        for symbol, (old, new) in sorted(event['changed'].items()):
+            if old is None:
+                print(f"[{fecha}] {symbol}: {new:.2f}")
+            else:
+                print(f"[{fecha}] {symbol}: {old:.2f} -> {new:.2f} ({(new - old) / old * 100:+.2f}%)")
+
+        if self.csv_path and event['changed']:
+            with open(self.csv_path, 'a') as f:
+                for symbol, (old, new) in sorted(event['changed'].items()):
+                    f.write(f"{fecha},{symbol},{new}\n")
+
+# Instancia global para usar en la aplicación
+quote_poller = QuotePoller()
+
+if __name__ == "__main__":
+    # Modo sin interfaz: vigilar el portafolio, registrar cambios y generar alertas
+    import argparse
+    from database import get_all_symbols, extend_valuaciones
+    from alerts.alert_manager import alert_manager
+
+    parser = argparse.ArgumentParser(description="Actualización de precios en segundo plano")
+    parser.add_argument("--interval", type=float, default=300, help="Segundos entre ciclos")
+    parser.add_argument("--csv", help="Archivo CSV donde agregar los cambios de precio")
+    args = parser.parse_args()
+
+    quote_poller.interval = args.interval
+    quote_poller.watch(get_all_symbols())
+    quote_poller.subscribe(PriceLogger(args.csv))
+    quote_poller.subscribe(alert_manager.on_price_update)
+    quote_poller.subscribe(alert_manager.run_retention)
+    quote_poller.subscribe(lambda event: extend_valuaciones())
+    quote_poller.start()
+    try:
+        while quote_poller.is_running():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        quote_poller.stop()
@@ -0,0 +1,190 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+class QuoteStore:
+    """
+    Almacén de precios en un solo archivo SQLite, indexado por símbolo.
+    La hora de descarga se guarda como dato (no como mtime de un archivo)
+    y delante hay una capa LRU en memoria para las lecturas repetidas.
+    Una entrada de la LRU se usa solo durante lru_ttl segundos; después se
+    vuelve a leer SQLite por si otro proceso guardó un precio más reciente.
+    """
+
+    def __init__(self, db_path="price_cache/quotes.db", lru_size=512, lru_ttl=5):
+        self.db_path = db_path
+        self.lru_size = lru_size
+        self.lru_ttl = lru_ttl
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cotizaciones (
+                simbolo TEXT PRIMARY KEY,
+                precio REAL NOT NULL,
+                timestamp REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS validez (
+                simbolo TEXT PRIMARY KEY,
+                valido INTEGER NOT NULL,
+                timestamp REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS metadatos (
+                simbolo TEXT PRIMARY KEY,
+                datos TEXT NOT NULL,
+                timestamp REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    def _remember(self, symbol, entry):
+        """Guardar en la capa LRU descartando la entrada más antigua"""
+        self._lru[symbol] = (entry, time.time())
+        self._lru.move_to_end(symbol)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get(self, symbol, max_age=None):
+        """Devuelve (precio, timestamp) o None"""
+        return self.get_many([symbol], max_age).get(symbol)
+
+    def get_many(self, symbols, max_age=None):
+        """
+        Devuelve {simbolo: (precio, timestamp)} para los símbolos guardados.
+        Con max_age solo se devuelven los precios con menos de max_age segundos.
+        """
+        now = time.time()
+        result = {}
+        missing = []
+
+        with self._lock:
+            for symbol in symbols:
+                cached = self._lru.get(symbol)
+                if cached is not None:
+                    entry, checked_at = cached
+                    if now - checked_at < self.lru_ttl and (max_age is None or now - entry[1] < max_age):
+                        self._lru.move_to_end(symbol)
+                        result[symbol] = entry
+                        continue
+                missing.append(symbol)
+
+            if missing:
+                # Otro proceso pudo haber actualizado el almacén
+                placeholders = ",".join("?" * len(missing))
+                rows = self._conn.execute(
+                    f"SELECT simbolo, precio, timestamp FROM cotizaciones WHERE simbolo IN ({placeholders})",
+                    missing
+                ).fetchall()
+                for symbol, price, timestamp in rows:
+                    self._remember(symbol, (price, timestamp))
+                    if max_age is None or now - timestamp < max_age:
+                        result[symbol] = (price, timestamp)
+
+        return result
+
+    def put(self, symbol, price, timestamp=None):
+        """Guardar el precio de un símbolo"""
+        self.put_many({symbol: price}, timestamp)
+
+    def put_many(self, prices, timestamp=None):
+        """Guardar {simbolo: precio} en una sola transacción"""
+        if not prices:
+            return
+        timestamp = timestamp or time.time()
+        rows = [(symbol, float(price), timestamp) for symbol, price in prices.items()]
+
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO cotizaciones(simbolo, precio, timestamp) VALUES(?,?,?)",
+                    rows
+                )
+            for symbol, price, ts in rows:
+                self._remember(symbol, (price, ts))
+
+    def get_validity(self, symbol, max_age):
+        """Resultado guardado de validar el símbolo (True/False) o None si no hay o venció"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT valido, timestamp FROM validez WHERE simbolo=?", (symbol,)
+            ).fetchone()
+        if row is None or time.time() - row[1] >= max_age:
+            return None
+        return bool(row[0])
+
+    def put_validity(self, symbol, valid):
+        """Guardar el resultado de validar un símbolo"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO validez(simbolo, valido, timestamp) VALUES(?,?,?)",
+                    (symbol, int(bool(valid)), time.time())
+                )
+
+    def get_metadata(self, symbol, max_age):
+        """Información descriptiva guardada del símbolo o None si no hay o venció"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT datos, timestamp FROM metadatos WHERE simbolo=?", (symbol,)
+            ).fetchone()
+        if row is None or time.time() - row[1] >= max_age:
+            return None
+        return json.loads(row[0])
+
+    def put_metadata(self, symbol, info):
+        """Guardar la información descriptiva (ticker.info) del símbolo"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO metadatos(simbolo, datos, timestamp) VALUES(?,?,?)",
+                    (symbol, json.dumps(info, default=str), time.time())
+                )
+
+    def count(self):
+        """Número de símbolos guardados"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cotizaciones").fetchone()[0]
+
+    def import_legacy_json(self, cache_dir):
+        """
+        Importar los archivos <SIMBOLO>.json del cache anterior conservando
+        la hora de descarga registrada en cada uno.
+        """
+        rows = []
+        for path in glob.glob(os.path.join(cache_dir, "*.json")):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                symbol = data.get('symbol') or os.path.splitext(os.path.basename(path))[0]
+                timestamp = datetime.fromisoformat(data['timestamp']).timestamp()
+                rows.append((symbol, float(data['price']), timestamp))
+            except Exception as e:
+                print(f"Cache anterior ignorado ({path}): {e}")
+
+        if rows:
+            with self._lock:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO cotizaciones(simbolo, precio, timestamp) VALUES(?,?,?)",
+                        rows
+                    )
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
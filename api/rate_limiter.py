@@ -0,0 +1,87 @@
+import threading
+import time
+
+THROTTLE_MARKERS = ("429", "too many requests", "rate limit", "ratelimit")
+
+def is_throttle_error(error):
+    """Detecta si una excepción del proveedor indica limitación de peticiones"""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+class TokenBucketRateLimiter:
+    """
+    Limitador de peticiones compartido por todos los hilos (token bucket).
+    rate: peticiones por segundo sostenidas; burst: peticiones seguidas
+    permitidas. Si el proveedor responde con limitación se aplica una
+    espera exponencial que se reduce con las respuestas correctas.
+    """
+
+    def __init__(self, rate=5.0, burst=10, initial_backoff=1.0, max_backoff=60.0):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.burst = burst
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._backoff = 0.0
+        self._blocked_until = 0.0
+        self.stats = {'requests': 0, 'waited': 0.0, 'throttled': 0}
+
+    def configure(self, rate=None, burst=None):
+        """Cambiar la tasa y la ráfaga permitidas"""
+        with self._lock:
+            if rate is not None:
+                self.rate = rate
+            if burst is not None:
+                self.burst = burst
+                self._tokens = min(self._tokens, float(burst))
+
+    def _refill(self, now):
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """Esperar hasta que haya tokens disponibles (como mucho burst a la vez)"""
+        while True:
+            with self._lock:
+                needed = min(float(tokens), float(self.burst))
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= needed:
+                    self._tokens -= needed
+                    self.stats['requests'] += tokens
+                    return
+                wait = max(self._blocked_until - now, (needed - self._tokens) / self.rate)
+                self.stats['waited'] += wait
+            time.sleep(wait)
+
+    def report_throttled(self):
+        """El proveedor limitó la petición: aumentar la espera exponencialmente"""
+        with self._lock:
+            self._backoff = min(self.max_backoff, self._backoff * 2 if self._backoff else self.initial_backoff)
+            self._blocked_until = time.monotonic() + self._backoff
+            self.stats['throttled'] += 1
+            print(f"⏳ Límite de peticiones alcanzado, esperando {self._backoff:.1f}s")
+
+    def report_success(self):
+        """Respuesta correcta: reducir la espera acumulada"""
+        if self._backoff:
+            with self._lock:
+                self._backoff = self._backoff / 2 if self._backoff > self.initial_backoff else 0.0
+
+    def call(self, func, *args, **kwargs):
+        """Ejecutar una petición al proveedor respetando el límite"""
+        return self.call_weighted(1, func, *args, **kwargs)
+
+    def call_weighted(self, tokens, func, *args, **kwargs):
+        """Ejecutar una llamada que hace tokens peticiones HTTP (descargas agrupadas)"""
+        self.acquire(tokens)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if is_throttle_error(e):
+                self.report_throttled()
+            raise
+        self.report_success()
+        return result
@@ -0,0 +1,110 @@
+import threading
+import time
+
+from api.rate_limiter import is_throttle_error
+
+class CircuitOpenError(Exception):
+    """El proveedor falló demasiadas veces seguidas y sus llamadas están suspendidas"""
+    pass
+
+# Errores de red (requests.RequestException hereda de OSError): el símbolo puede ser válido
+NETWORK_ERRORS = (ConnectionError, TimeoutError, OSError)
+
+def is_transient_error(error):
+    """
+    Fallo pasajero (red, limitación o cortacircuitos abierto) que no dice
+    nada del símbolo; lo manejan el limitador y el cortacircuitos
+    """
+    return (isinstance(error, NETWORK_ERRORS + (CircuitOpenError,))
+            or is_throttle_error(error))
+
+class CircuitBreaker:
+    """
+    Cortacircuitos por proveedor. Tras failure_threshold fallos seguidos se
+    abre y rechaza las llamadas durante reset_timeout segundos; después deja
+    pasar una llamada de prueba (semiabierto) y se cierra si tiene éxito.
+    """
+
+    def __init__(self, name="proveedor", failure_threshold=5, reset_timeout=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def _before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                raise CircuitOpenError(f"Circuito abierto para {self.name}")
+            self._probing = True
+
+    def _on_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def _on_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    print(f"⚡ Circuito abierto para {self.name} tras {self._failures} fallos")
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def call(self, func, *args, **kwargs):
+        """Ejecutar func a través del cortacircuitos"""
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self._on_failure()
+            raise
+        self._on_success()
+        return result
+
+class NegativeCache:
+    """Símbolos que fallaron o no devolvieron datos, bloqueados durante ttl segundos"""
+
+    def __init__(self, ttl=900):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def add(self, symbol, reason=""):
+        with self._lock:
+            self._entries[symbol] = (time.time() + self.ttl, reason)
+
+    def discard(self, symbol):
+        with self._lock:
+            self._entries.pop(symbol, None)
+
+    def __contains__(self, symbol):
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is None:
+                return False
+            if entry[0] <= time.time():
+                del self._entries[symbol]
+                return False
+            return True
+
+    def get_blocked(self):
+        """{simbolo: motivo} de los símbolos bloqueados actualmente"""
+        now = time.time()
+        with self._lock:
+            return {symbol: reason for symbol, (expires, reason) in self._entries.items() if expires > now}
@@ -0,0 +1,89 @@
+import threading
+
+class _Call:
+    """Petición en curso compartida por todos los que esperan la misma clave"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Registro de peticiones en curso. Si varios hilos piden la misma clave
+    (por ejemplo ('quote', 'AAPL') o ('history', 'AAPL', '6mo', '1d')) al
+    mismo tiempo, solo el primero llama al proveedor y el resto espera su
+    resultado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {}
+
+    def _count(self, kind, counter, amount=1):
+        stats = self._stats.setdefault(kind, {'hits': 0, 'upstream': 0, 'coalesced': 0})
+        stats[counter] += amount
+
+    def record_hit(self, kind, amount=1):
+        """Registrar peticiones resueltas desde cache (sin ir al proveedor)"""
+        if amount:
+            with self._lock:
+                self._count(kind, 'hits', amount)
+
+    def record_upstream(self, kind, amount=1):
+        """Registrar llamadas al proveedor hechas dentro de share()"""
+        if amount:
+            with self._lock:
+                self._count(kind, 'upstream', amount)
+
+    def do(self, key, func, *args, **kwargs):
+        """Ejecutar func una sola vez por clave entre los hilos concurrentes"""
+        return self._run(key, func, args, kwargs, count_upstream=True)
+
+    def share(self, key, func, *args, **kwargs):
+        """
+        Como do(), pero func decide si va al proveedor: debe registrar
+        record_upstream o record_hit por su cuenta
+        """
+        return self._run(key, func, args, kwargs, count_upstream=False)
+
+    def _run(self, key, func, args, kwargs, count_upstream):
+        kind = key[0]
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._count(kind, 'coalesced')
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                if count_upstream:
+                    self._count(kind, 'upstream')
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def get_stats(self):
+        """Contadores por tipo de petición: hits, upstream y coalesced"""
+        with self._lock:
+            return {kind: dict(stats) for kind, stats in self._stats.items()}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {}
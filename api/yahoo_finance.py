@@ -1,129 +1,302 @@
-import yfinance as yf
 import pandas as pd
-from datetime import datetime, timedelta
 import time
-import json
 import os
 import numpy as np
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from scipy import stats
+from api.providers import create_provider
+from api.quote_store import QuoteStore
+from api.history_store import HistoryStore
+from api.single_flight import SingleFlight
+from api.rate_limiter import TokenBucketRateLimiter
+from api.resilience import CircuitBreaker, CircuitOpenError, NegativeCache, is_transient_error
+from api.market_hours import MarketHoursPolicy
+from api.fx_service import FXService, fx_pair
 
 class YahooFinanceAPI:
 
-    def __init__(self):
+    def __init__(self, provider=None):
+        self.provider = provider or create_provider()
         self.cache_dir = "price_cache"
-        self.cache_duration = 300
-        self.usd_mxn_rate = None
-        self.usd_mxn_cache_time = None
+        self.cache_duration = 300  # Vigencia con el mercado abierto
+        # Con el mercado cerrado los precios valen hasta la siguiente apertura
+        self.use_market_hours = True
+        self.market_hours = MarketHoursPolicy(crypto_ttl=60)
+        self.asset_types = {}  # simbolo -> tipo de la tabla activos
+        self._asset_types_loaded = False
+        # Stale-while-revalidate: un precio vencido hace menos de stale_grace
+        # segundos se devuelve al instante y se actualiza en segundo plano
+        self.stale_while_revalidate = True
+        self.stale_grace = 1800
+        self.max_workers = 8  # Hilos máximos para descargas individuales
         self._ensure_cache_dir()
+        self.quote_store = QuoteStore(os.path.join(self.cache_dir, "quotes.db"))
+        if self.quote_store.count() == 0:
+            self.quote_store.import_legacy_json(self.cache_dir)
+        self.history_store = HistoryStore(os.path.join(self.cache_dir, "history.db"))
+        self.single_flight = SingleFlight()
+        # Todas las peticiones al proveedor pasan por este limitador (los hits de cache no)
+        self.rate_limiter = TokenBucketRateLimiter(rate=5.0, burst=10)
+        # Símbolos sin datos (deslistados o mal escritos) y protección del proveedor
+        self.negative_cache = NegativeCache(ttl=900)
+        self.circuit_breaker = CircuitBreaker(self.provider.name, failure_threshold=5, reset_timeout=60)
+        self.validity_ttl = 7 * 24 * 3600
+        self.invalid_ttl = 24 * 3600
+        # Nombre, sector, moneda, bolsa... casi nunca cambian
+        self.metadata_ttl = 7 * 24 * 3600
+        # Actualizaciones en segundo plano: hilos daemon que leen de una cola,
+        # así la salida del intérprete no espera a que terminen
+        self.refresh_workers = 2
+        self._refresh_queue = queue.Queue()
+        self._refresh_threads = []
+        self._refresh_lock = threading.Lock()
+        self._refreshing = set()
+        self._closed = False
+        # Tipos de cambio y moneda nativa de cada símbolo
+        self.fx = FXService(self)
+    
+    def set_provider(self, provider):
+        """Cambiar el proveedor de precios (por ejemplo ReplayProvider para pruebas sin red)"""
+        self.provider = provider
+        self.circuit_breaker = CircuitBreaker(provider.name, self.circuit_breaker.failure_threshold,
+                                              self.circuit_breaker.reset_timeout)
     
     def _ensure_cache_dir(self):
         """Crea el directorio de cache si no existe"""
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
     
-    def _get_cache_path(self, symbol):
-        """Obtiene la ruta del archivo de cache para un símbolo"""
-        return os.path.join(self.cache_dir, f"{symbol}.json")
+    def get_request_stats(self):
+        """Contadores de peticiones: resueltas en cache, enviadas al proveedor y agrupadas"""
+        stats = self.single_flight.get_stats()
+        stats['circuit'] = self.circuit_breaker.state
+        stats['negative_cache'] = self.negative_cache.get_blocked()
+        return stats
     
-    def _is_cache_valid(self, cache_path):
-        """Verifica si el cache es válido"""
-        if not os.path.exists(cache_path):
-            return False
-        
-        file_time = os.path.getmtime(cache_path)
-        current_time = time.time()
-        return (current_time - file_time) < self.cache_duration
+    def _call_upstream(self, func, *args, **kwargs):
+        """Llamada al proveedor a través del cortacircuitos y del limitador"""
+        return self.circuit_breaker.call(self.rate_limiter.call, func, *args, **kwargs)
+    
+    def _call_upstream_batch(self, requests, func, *args, **kwargs):
+        """Como _call_upstream, para una llamada que hace requests peticiones HTTP"""
+        return self.circuit_breaker.call(self.rate_limiter.call_weighted, requests, func, *args, **kwargs)
+    
+    def set_asset_types(self, asset_types):
+        """Registrar el tipo de activo ({simbolo: tipo}) para calcular la vigencia de precios"""
+        self.asset_types.update(asset_types)
+    
+    def load_asset_types(self):
+        """Leer los tipos de la tabla activos (al primer uso y cuando se vigilan símbolos nuevos)"""
+        from database import get_tipos_activos
+        self.set_asset_types(get_tipos_activos())
+        self._asset_types_loaded = True
+    
+    def get_asset_type(self, symbol):
+        if not self._asset_types_loaded:
+            self.load_asset_types()
+        return self.asset_types.get(symbol)
+    
+    def is_polled(self, symbol):
+        """La renta fija (cetes, otro_fija) no se consulta en Yahoo Finance"""
+        return self.market_hours.is_polled(self.get_asset_type(symbol))
+    
+    def _cache_expiry(self, symbol, timestamp):
+        """Epoch en el que vence un precio descargado en timestamp"""
+        if not self.use_market_hours:
+            return timestamp + self.cache_duration
+        return self.market_hours.expires_at(symbol, timestamp, self.cache_duration,
+                                            self.get_asset_type(symbol))
+    
+    def _is_cache_valid(self, symbol, timestamp):
+        """Verifica si un precio descargado en timestamp sigue vigente"""
+        return time.time() < self._cache_expiry(symbol, timestamp)
+    
+    def _is_cache_usable(self, symbol, timestamp):
+        """Verifica si un precio vencido todavía puede servirse mientras se actualiza"""
+        if not self.stale_while_revalidate:
+            return self._is_cache_valid(symbol, timestamp)
+        return time.time() < self._cache_expiry(symbol, timestamp) + self.stale_grace
+    
+    def close(self):
+        """Detener las actualizaciones en segundo plano y descartar las pendientes"""
+        self._closed = True
+        while True:
+            try:
+                symbols = self._refresh_queue.get_nowait()
+            except queue.Empty:
+                break
+            if symbols:
+                with self._refresh_lock:
+                    self._refreshing.difference_update(symbols)
+        with self._refresh_lock:
+            for _ in self._refresh_threads:
+                self._refresh_queue.put(None)
+            self._refresh_threads = []
+    
+    def _refresh_worker(self):
+        while True:
+            symbols = self._refresh_queue.get()
+            if symbols is None:
+                break
+            self._refresh_prices(symbols)
+    
+    def _schedule_refresh(self, symbols):
+        """Encolar la actualización en segundo plano de precios vencidos"""
+        if self._closed:
+            return
+        with self._refresh_lock:
+            symbols = [symbol for symbol in symbols if symbol not in self._refreshing]
+            if not symbols:
+                return
+            self._refreshing.update(symbols)
+            while len(self._refresh_threads) < self.refresh_workers:
+                thread = threading.Thread(target=self._refresh_worker, daemon=True,
+                                          name=f"quote-refresh-{len(self._refresh_threads)}")
+                thread.start()
+                self._refresh_threads.append(thread)
+        self._refresh_queue.put(symbols)
+    
+    def _refresh_prices(self, symbols):
+        """Descargar y guardar precios (se ejecuta en segundo plano)"""
+        try:
+            if self._closed:
+                return
+            fetched = self._fetch_batch_prices(symbols)
+            missing = [symbol for symbol in symbols if symbol not in fetched]
+            if missing and not self._closed:
+                fetched.update(self._fetch_prices_concurrently(missing))
+            self.quote_store.put_many(fetched)
+        except RuntimeError as e:
+            # Al salir, concurrent.futures ya no acepta trabajo: se descarta
+            if "shutdown" not in str(e):
+                print(f"Error actualizando precios en segundo plano: {e}")
+        except Exception as e:
+            print(f"Error actualizando precios en segundo plano: {e}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.difference_update(symbols)
     
     def get_usd_mxn_rate(self, force_update=False):
         """
         Obtener tipo de cambio USD/MXN con cache
         """
-        current_time = time.time()
-        
-        if (self.usd_mxn_rate is not None and 
-            self.usd_mxn_cache_time is not None and
-            (current_time - self.usd_mxn_cache_time) < self.cache_duration and
-            not force_update):
-            return self.usd_mxn_rate
-        
+        return self.fx.get_rate("USD", "MXN", force_update)
+    
+    def _read_cached_price(self, symbol):
+        """
+        Lee el precio en USD del cache si sigue vigente. Si venció pero está
+        dentro del margen de stale_grace se devuelve y se actualiza en segundo plano
+        """
+        entry = self.quote_store.get(symbol)
+        if entry is None or not self._is_cache_usable(symbol, entry[1]):
+            return None
+        if not self._is_cache_valid(symbol, entry[1]):
+            self._schedule_refresh([symbol])
+        self.single_flight.record_hit("quote")
+        return entry[0]
+    
+    def _save_cached_price(self, symbol, price):
+        """Guarda el precio en USD en el cache"""
+        self.quote_store.put(symbol, price)
+    
+    def _fetch_price(self, symbol):
+        """
+        Descarga el precio actual de un símbolo (sin cache). Las peticiones
+        simultáneas del mismo símbolo comparten una sola descarga y los
+        símbolos que fallaron recientemente no se vuelven a pedir
+        """
+        if symbol in self.negative_cache:
+            return None
+        return self.single_flight.do(("quote", symbol), self._fetch_price_upstream, symbol)
+    
+    def _fetch_price_upstream(self, symbol):
         try:
-            ticker = yf.Ticker("USDMXN=X")
-            info = ticker.info
-            
-            current_rate = (info.get('currentPrice') or 
-                           info.get('regularMarketPrice') or 
-                           info.get('ask') or 
-                           info.get('bid') or 
-                           0)
-            
-            if current_rate == 0:
-                hist = ticker.history(period="1d")
-                if not hist.empty:
-                    current_rate = hist['Close'].iloc[-1]
-            
-            self.usd_mxn_rate = current_rate
-            self.usd_mxn_cache_time = current_time
-            
-            print(f"💰 Tipo de cambio USD/MXN actualizado: {current_rate:.2f}")
-            return current_rate
-            
+            price = self._call_upstream(self.provider.get_quote, symbol)
         except Exception as e:
-            print(f"Error obteniendo tipo de cambio USD/MXN: {e}")
-            return 17.0  # Valor por defecto
+            # Solo "sin datos / no encontrado" bloquea el símbolo; red y límites no
+            if not is_transient_error(e):
+                self.negative_cache.add(symbol, str(e))
+            raise
+        if not price:
+            self.negative_cache.add(symbol, "sin datos")
+        return price
     
-    def get_current_price(self, symbol, currency="USD"):
+    def _fetch_batch_prices(self, symbols):
         """
-        Obtener precio en la moneda especificada
+        Descarga el último cierre de varios símbolos en una sola petición.
+        Los símbolos sin datos no aparecen en el resultado.
         """
-        cache_path = self._get_cache_path(symbol)
+        symbols = [symbol for symbol in symbols if symbol not in self.negative_cache]
+        if not self.provider.supports_batch or len(symbols) < 2:
+            return {}
         
-        # Verificar cache primero
-        if self._is_cache_valid(cache_path):
+        # Cada símbolo es una petición: bloques de a lo más burst, cada uno paga sus tokens
+        size = max(2, int(self.rate_limiter.burst))
+        prices = {}
+        for i in range(0, len(symbols), size):
+            chunk = symbols[i:i + size]
+            if len(chunk) < 2:
+                # El último símbolo suelto se pide de forma individual
+                break
+            try:
+                prices.update(self.single_flight.do(
+                    ("quotes", tuple(chunk)), self._call_upstream_batch, len(chunk),
+                    self.provider.get_quotes, chunk
+                ))
+            except Exception as e:
+                print(f"Error en descarga agrupada de precios: {e}")
+        return prices
+    
+    def _fetch_prices_concurrently(self, symbols):
+        """Descarga precios individuales usando un pool de hilos acotado"""
+        prices = {}
+        if not symbols:
+            return prices
+        
+        def fetch(symbol):
             try:
-                with open(cache_path, 'r') as f:
-                    data = json.load(f)
-                    usd_price = data['price']
-            except:
-                usd_price = None
-        else:
-            usd_price = None
+                return symbol, self._fetch_price(symbol)
+            except Exception as e:
+                print(f"Error obteniendo precio de {symbol}: {e}")
+                return symbol, None
+        
+        workers = min(self.max_workers, len(symbols))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for symbol, price in executor.map(fetch, symbols):
+                if price:
+                    prices[symbol] = price
+        
+        return prices
+    
+    def get_current_price(self, symbol, currency=None):
+        """
+        Obtener precio en la moneda especificada (None: moneda nativa del símbolo)
+        """
+        if not self.is_polled(symbol):
+            return None
+        
+        # Verificar cache primero
+        usd_price = self._read_cached_price(symbol)
         
         if usd_price is None:
             try:
-                ticker = yf.Ticker(symbol)
-                info = ticker.info
-                
-                current_price = (info.get('currentPrice') or 
-                               info.get('regularMarketPrice') or 
-                               info.get('ask') or 
-                               info.get('bid') or 
-                               0)
-                
-                if current_price == 0:
-                    hist = ticker.history(period="1d")
-                    if not hist.empty:
-                        current_price = hist['Close'].iloc[-1]
+                usd_price = self._fetch_price(symbol)
+                if not usd_price:
+                    return None
                 
                 # Guardar en cache
-                cache_data = {
-                    'price': current_price,
-                    'timestamp': datetime.now().isoformat(),
-                    'symbol': symbol
-                }
-                
-                with open(cache_path, 'w') as f:
-                    json.dump(cache_data, f)
-                
-                usd_price = current_price
+                self._save_cached_price(symbol, usd_price)
                 
             except Exception as e:
                 print(f"Error obteniendo precio de {symbol}: {e}")
                 return None
         
-        # Convertir a MXN si se solicita
-        if currency.upper() == "MXN":
-            exchange_rate = self.get_usd_mxn_rate()
-            return usd_price * exchange_rate
+        # Convertir desde la moneda nativa si se solicita otra
+        if currency:
+            factor = self.fx.get_conversion_factors([symbol], currency)[symbol]
+            return None if factor is None else usd_price * factor
         
         return usd_price
     
@@ -133,42 +306,161 @@ class YahooFinanceAPI:
         period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max
         """
         try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period)
-            return hist
+            return self.get_history(symbol, period)
         except Exception as e:
             print(f"Error obteniendo histórico de {symbol}: {e}")
             return None
     
-    def get_multiple_prices(self, symbols, currency="USD"):
+    def get_history(self, symbol, period="6mo", interval="1d"):
         """
-        Obtener precios en la moneda especificada
+        Histórico OHLCV servido desde el almacén local; solo se descargan
+        las barras posteriores a la última guardada
         """
-        prices = {}
-        exchange_rate = self.get_usd_mxn_rate() if currency.upper() == "MXN" else 1.0
+        return self.single_flight.share(
+            ("history", symbol, period, interval),
+            self._load_history, symbol, period, interval
+        )
+    
+    def _load_history(self, symbol, period, interval):
+        """Lectura del almacén; cuenta un hit si no hizo falta descargar nada"""
+        fetched = []
+        
+        def fetch(*args, **kwargs):
+            fetched.append(True)
+            return self._fetch_history(*args, **kwargs)
         
+        data = self.history_store.get_history(symbol, period, interval, fetch)
+        if not fetched:
+            self.single_flight.record_hit("history")
+        return data
+    
+    def _fetch_history(self, symbol, period=None, interval="1d", start=None):
+        """
+        Descarga de histórico para HistoryStore; respeta el cache negativo de
+        ese (símbolo, intervalo). Un histórico vacío no bloquea los precios y
+        un precio fallido no bloquea el histórico
+        """
+        if (symbol, interval) in self.negative_cache:
+            raise ValueError(f"{symbol} sin datos recientemente, se omite la descarga")
+        self.single_flight.record_upstream("history")
+        data = self._call_upstream(self.provider.get_history, symbol, period=period, interval=interval, start=start)
+        if start is None and (data is None or data.empty):
+            self.negative_cache.add((symbol, interval), "histórico vacío")
+        return data
+    
+    def get_info(self, symbol):
+        """Información descriptiva del símbolo (ticker.info), siempre del proveedor"""
+        return self._call_upstream(self.provider.get_info, symbol)
+    
+    def get_metadata(self, symbol, force_update=False):
+        """
+        Información descriptiva del símbolo con cache en disco de metadata_ttl.
+        Los precios no salen de aquí: usan get_current_price
+        """
+        if not force_update:
+            info = self.quote_store.get_metadata(symbol, self.metadata_ttl)
+            if info is not None:
+                self.single_flight.record_hit("info")
+                return info
+        
+        info = self.single_flight.do(("info", symbol), self.get_info, symbol)
+        if info:
+            self.quote_store.put_metadata(symbol, info)
+            self.fx.set_native_currencies({symbol: info.get('currency')})
+        return info
+    
+    def get_asset_name(self, symbol):
+        """Nombre del activo según la metadata (None si no se conoce)"""
+        try:
+            info = self.get_metadata(symbol)
+        except Exception as e:
+            print(f"Error obteniendo nombre de {symbol}: {e}")
+            return None
+        if not info:
+            return None
+        return info.get('longName') or info.get('shortName')
+    
+    def _read_cached_prices(self, symbols):
+        """
+        Precios en USD vigentes (o vencidos dentro del margen) en una sola consulta.
+        Devuelve ({simbolo: precio}, [símbolos pendientes de descargar])
+        """
+        cached = self.quote_store.get_many(symbols)
+        usd_prices = {symbol: entry[0] for symbol, entry in cached.items()
+                      if self._is_cache_usable(symbol, entry[1])}
+        self._schedule_refresh([symbol for symbol in usd_prices
+                                if not self._is_cache_valid(symbol, cached[symbol][1])])
+        self.single_flight.record_hit("quote", len(usd_prices))
+        pending = [symbol for symbol in dict.fromkeys(symbols)
+                   if symbol not in usd_prices and self.is_polled(symbol)]
+        return usd_prices, pending
+    
+    def _save_cached_prices(self, prices):
+        """Guarda varios precios en USD en una sola transacción"""
+        try:
+            self.quote_store.put_many(prices)
+        except Exception as e:
+            print(f"Error guardando cache de precios: {e}")
+    
+    def get_multiple_prices(self, symbols, currency=None):
+        """
+        Obtener precios en la moneda especificada (None: moneda nativa de
+        cada símbolo). Las tasas de cambio necesarias se piden una sola vez
+        """
+        prices = self.get_native_prices(symbols)
+        if currency:
+            prices = self.fx.convert_prices(prices, currency)
+        return prices
+    
+    def get_native_prices(self, symbols):
+        """
+        Precios en la moneda nativa de cada símbolo.
+        Los símbolos sin cache se piden en una sola descarga agrupada y los
+        que falten se piden en paralelo con un pool de hilos acotado.
+        """
+        usd_prices, pending = self._read_cached_prices(symbols)
+        
+        if pending:
+            fetched = self._fetch_batch_prices(pending)
+            missing = [symbol for symbol in pending if symbol not in fetched]
+            fetched.update(self._fetch_prices_concurrently(missing))
+            
+            self._save_cached_prices(fetched)
+            usd_prices.update(fetched)
+        
+        prices = {}
         for symbol in symbols:
-            price = self.get_current_price(symbol, "USD")  # Siempre obtener en USD primero
-            if price is not None:
-                prices[symbol] = price * exchange_rate
-            time.sleep(0.1)
+            if usd_prices.get(symbol) is not None:
+                prices[symbol] = usd_prices[symbol]
         
         return prices
     
     def validate_symbol(self, symbol):
-        """Verifica si un símbolo es válido en Yahoo Finance"""
+        """
+        Verifica si un símbolo es válido en Yahoo Finance. El resultado se
+        guarda (validity_ttl si es válido, invalid_ttl si no)
+        """
+        valid = self.quote_store.get_validity(symbol, self.validity_ttl)
+        if valid is False:
+            valid = self.quote_store.get_validity(symbol, self.invalid_ttl)
+        if valid is not None:
+            return valid
+        
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            return info is not None and len(info) > 0
-        except:
+            info = self.get_metadata(symbol)
+            valid = info is not None and len(info) > 0
+        except CircuitOpenError:
             return False
+        except:
+            valid = False
+        
+        self.quote_store.put_validity(symbol, valid)
+        return valid
         
 def get_historical_data(symbol, period="6mo"):
     """Obtener datos históricos para análisis técnico"""
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period=period)
+        hist = yahoo_api.get_history(symbol, period)
 
         # Verificar que tenemos datos
         if hist.empty:
@@ -188,7 +480,6 @@ def get_multiple_historical_data(symbols, period="6mo"):
         data = get_historical_data(symbol, period)
         if data is not None:
             historical_data[symbol] = data
-        time.sleep(0.3)  # Evitar rate limiting de Yahoo Finance
     return historical_data
     
 def get_intraday_data(symbol, interval="15m", period="1d"):
@@ -197,8 +488,7 @@ def get_intraday_data(symbol, interval="15m", period="1d"):
     interval: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h
     """
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period=period, interval=interval)
+        hist = yahoo_api.get_history(symbol, period, interval)
         return hist
     except Exception as e:
         print(f"Error obteniendo datos intradía de {symbol}: {e}")
@@ -207,8 +497,7 @@ def get_intraday_data(symbol, interval="15m", period="1d"):
 def get_detailed_info(symbol):
     """Obtener información detallada de un símbolo"""
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        info = yahoo_api.get_metadata(symbol)
         return info
     except Exception as e:
         print(f"Error obteniendo info de {symbol}: {e}")
@@ -237,12 +526,17 @@ def calculate_confidence_interval(prices, window=60, confidence=0.90):
         print(f"Error calculando intervalo de confianza: {e}")
         return None, None, None
 
-def get_alert_conditions(symbol, window=60, confidence=0.90):
+def get_alert_conditions(symbol, window=60, confidence=0.90, current_price=None):
     """
-    Obtener condiciones para alertas basadas en intervalo de confianza
+    Obtener condiciones para alertas basadas en intervalo de confianza.
+    current_price: precio ya conocido (por ejemplo el publicado por el poller)
     Returns: dict con current_price, moving_avg, lower_band, upper_band, alert_message
     """
     try:
+        # La renta fija no cotiza en Yahoo Finance
+        if not yahoo_api.is_polled(symbol):
+            return None
+        
         # Obtener datos históricos
         historical_data = get_historical_data(symbol, "6mo")
         if historical_data is None or historical_data.empty:
@@ -254,7 +548,8 @@ def get_alert_conditions(symbol, window=60, confidence=0.90):
         )
         
         # Obtener precio actual
-        current_price = get_current_price(symbol)
+        if current_price is None:
+            current_price = get_current_price(symbol)
         if current_price is None:
             return None
         
@@ -293,56 +588,105 @@ def get_alert_conditions(symbol, window=60, confidence=0.90):
 
 def get_usd_mxn_rate():
     """
-    Obtener el tipo de cambio USD/MXN actual de Yahoo Finance
+    Obtener el tipo de cambio USD/MXN actual (con cache)
     """
-    try:
-        # USDMXN=X es el símbolo para USD/MXN en Yahoo Finance
-        ticker = yf.Ticker("USDMXN=X")
-        info = ticker.info
-        
-        # Intentar diferentes campos para el precio
-        current_rate = (info.get('currentPrice') or 
-                       info.get('regularMarketPrice') or 
-                       info.get('ask') or 
-                       info.get('bid') or 
-                       0)
-        
-        if current_rate == 0:
-            # Fallback: obtener del historial del día
-            hist = ticker.history(period="1d")
-            if not hist.empty:
-                current_rate = hist['Close'].iloc[-1]
-        
-        print(f"💰 Tipo de cambio USD/MXN obtenido: {current_rate}")
-        return current_rate
-        
-    except Exception as e:
-        print(f"Error obteniendo tipo de cambio USD/MXN: {e}")
-        return 17.0  # Valor por defecto en caso de error
+    return yahoo_api.get_usd_mxn_rate()
 
 def get_current_price_mxn(symbol):
     """
     Obtener precio en MXN de un símbolo
     """
-    usd_price = get_current_price(symbol)
-    if usd_price is None:
-        return None
-    
-    exchange_rate = get_usd_mxn_rate()
-    return usd_price * exchange_rate
+    return yahoo_api.get_current_price(symbol, "MXN")
 
 def get_multiple_prices_mxn(symbols):
     """
     Obtener precios en MXN de múltiples símbolos
     """
-    usd_prices = get_multiple_prices(symbols)
-    exchange_rate = get_usd_mxn_rate()
+    return yahoo_api.get_multiple_prices(symbols, "MXN")
+
+def _to_daily_index(index):
+    """Índice diario sin zona horaria (fecha local de cada barra)"""
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    return pd.DatetimeIndex(index).normalize()
+
+def get_fx_series(period="6mo", pair=fx_pair("MXN")):
+    """
+    Serie diaria de cierres del tipo de cambio. Se sirve desde el almacén de
+    históricos, así que solo se descarga la cola que falte.
+    """
+    fx_data = get_historical_data(pair, period)
+    if fx_data is None:
+        return None
+    
+    series = fx_data['Close'].dropna()
+    series.index = _to_daily_index(series.index)
+    return series[~series.index.duplicated(keep='last')]
+
+def convert_historical_to_mxn(historical_data, period="6mo"):
+    """
+    Convertir a MXN un diccionario {simbolo: DataFrame} con una sola
+    multiplicación vectorizada. Cada símbolo se convierte desde su moneda
+    nativa; los tipos de cambio se alinean por fecha y se rellenan hacia
+    adelante para los días sin cotización.
+    """
+    if not historical_data:
+        return {}
     
-    mxn_prices = {}
-    for symbol, usd_price in usd_prices.items():
-        mxn_prices[symbol] = usd_price * exchange_rate
+    symbols = list(historical_data.keys())
+    frames = [historical_data[symbol] for symbol in symbols]
+    natives = [yahoo_api.fx.get_native_currency(symbol) for symbol in symbols]
     
-    return mxn_prices
+    # Una serie USD -> moneda por cada moneda involucrada
+    fx = {"USD": None}
+    for currency in set(natives) | {"MXN"}:
+        if currency in fx:
+            continue
+        series = get_fx_series(period, fx_pair(currency))
+        if series is None or series.empty:
+            print(f"Warning: No se pudieron obtener datos históricos de USD/{currency}")
+            return historical_data
+        fx[currency] = series
+    
+    dates = _to_daily_index(np.concatenate([_to_daily_index(frame.index).to_numpy() for frame in frames]))
+    
+    # Tasas USD -> moneda alineadas a todas las fechas del panel
+    all_dates = dates.unique()
+    for series in fx.values():
+        if series is not None:
+            all_dates = series.index.union(all_dates)
+    table = pd.DataFrame({currency: (series.reindex(all_dates) if series is not None else 1.0)
+                          for currency, series in fx.items()}, index=all_dates)
+    table = table.ffill().bfill().reindex(dates)
+    
+    # Tasa nativa -> MXN de cada fila: USD->MXN / USD->nativa
+    columns = np.repeat([table.columns.get_loc(native) for native in natives],
+                        [len(frame) for frame in frames])
+    table_values = table.to_numpy(dtype=float)
+    rows = np.arange(len(dates))
+    rates = table_values[rows, table.columns.get_loc("MXN")] / table_values[rows, columns]
+    
+    # Cotizaciones en subunidades (GBp, ZAc, ...) a la moneda nativa
+    scales = np.repeat([yahoo_api.fx.get_unit_scale(symbol) for symbol in symbols],
+                       [len(frame) for frame in frames])
+    rates = rates * scales
+    
+    price_columns = ['Open', 'High', 'Low', 'Close']
+    values = np.concatenate([frame.reindex(columns=price_columns).to_numpy(dtype=float) for frame in frames])
+    values = values * rates[:, None]
+    
+    converted = {}
+    offset = 0
+    for symbol, frame in zip(symbols, frames):
+        rows = len(frame)
+        result = frame.copy()
+        for position, column in enumerate(price_columns):
+            if column in result.columns:
+                result[column] = values[offset:offset + rows, position]
+        converted[symbol] = result
+        offset += rows
+    
+    return converted
 
 def get_historical_data_mxn(symbol, period="6mo"):
     """
@@ -352,27 +696,13 @@ def get_historical_data_mxn(symbol, period="6mo"):
     if historical_data is None:
         return None
     
-    # Obtener tipo de cambio histórico USD/MXN
-    usdmxn_data = get_historical_data("USDMXN=X", period)
-    
-    if usdmxn_data is None:
-        print("Warning: No se pudieron obtener datos históricos de USD/MXN")
-        return historical_data
-    
-    # Convertir precios a MXN
-    # Alinear los índices de fechas
-    aligned_data = historical_data.copy()
-    
-    for column in ['Open', 'High', 'Low', 'Close']:
-        if column in historical_data.columns:
-            # Convertir usando el tipo de cambio del mismo día
-            aligned_data[column] = historical_data[column] * usdmxn_data['Close']
-    
-    # Convertir volumen si existe
-    if 'Volume' in historical_data.columns:
-        aligned_data['Volume'] = historical_data['Volume']
-    
-    return aligned_data
+    return convert_historical_to_mxn({symbol: historical_data}, period)[symbol]
+
+def get_multiple_historical_data_mxn(symbols, period="6mo"):
+    """
+    Obtener datos históricos en MXN para múltiples símbolos
+    """
+    return convert_historical_to_mxn(get_multiple_historical_data(symbols, period), period)
     
 # Instancia global para usar en la aplicación
 yahoo_api = YahooFinanceAPI()
@@ -385,4 +715,7 @@ def get_multiple_prices(symbols):
     return yahoo_api.get_multiple_prices(symbols)
 
 def validate_symbol(symbol):
-    return yahoo_api.validate_symbol(symbol)
\ No newline at end of file
+    return yahoo_api.validate_symbol(symbol)
+
+def get_asset_name(symbol):
+    return yahoo_api.get_asset_name(symbol)
\ No newline at end of file
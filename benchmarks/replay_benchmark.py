@@ -0,0 +1,70 @@
+"""
+Mide el rendimiento de los flujos de precios, alertas y pronósticos sin red,
+usando ReplayProvider.
+
+Ejemplo:
+    python benchmarks/replay_benchmark.py --data-dir price_cache --latency 0.2 --error-rate 0.05
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.providers import ReplayProvider
+from api.yahoo_finance import yahoo_api, get_alert_conditions, get_historical_data
+from database import get_all_symbols, get_portfolio_with_current_prices
+from forecast.models import forecast_manager
+
+def measure(label, func, rounds):
+    """Ejecuta func varias veces e imprime el tiempo promedio"""
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    avg = sum(times) / len(times)
+    print(f"{label:<40} promedio {avg * 1000:9.1f} ms | mejor {min(times) * 1000:9.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sin red con ReplayProvider")
+    parser.add_argument("--data-dir", default="price_cache", help="Directorio con precios/históricos")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada en segundos")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variación aleatoria de la latencia")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proporción de peticiones fallidas")
+    parser.add_argument("--rounds", type=int, default=3, help="Repeticiones por medición")
+    parser.add_argument("--keep-cache", action="store_true", help="No invalidar el cache de precios")
+    args = parser.parse_args()
+
+    yahoo_api.set_provider(ReplayProvider(
+        data_dir=args.data_dir,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=42
+    ))
+    if not args.keep_cache:
+        yahoo_api.cache_duration = 0
+        yahoo_api.use_market_hours = False
+        # Sin esto los precios vencidos se sirven del cache durante stale_grace
+        yahoo_api.stale_while_revalidate = False
+
+    symbols = get_all_symbols()
+    print(f"Símbolos en portafolio: {len(symbols)}")
+
+    measure("get_portfolio_with_current_prices", get_portfolio_with_current_prices, args.rounds)
+    measure("get_alert_conditions (portafolio)",
+            lambda: [get_alert_conditions(symbol) for symbol in symbols], args.rounds)
+
+    def forecast():
+        for symbol in symbols:
+            data = get_historical_data(symbol, "1y")
+            if data is not None and not data.empty:
+                forecast_manager.train_model(data['Close'], 'linear')
+                forecast_manager.make_forecast(30)
+
+    measure("pronóstico lineal (portafolio)", forecast, args.rounds)
+
+if __name__ == "__main__":
+    main()
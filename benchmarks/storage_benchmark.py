@@ -0,0 +1,107 @@
+"""
+Compara los perfiles de almacenamiento de SQLite (database.STORAGE_PROFILES)
+sobre una base de datos sintética: velocidad de inserción y latencia de
+get_portfolio_with_current_prices y get_alertas.
+
+La base se crea en un archivo temporal (o --db) y se reconstruye para cada
+perfil; los precios salen de ReplayProvider, así que no se usa la red.
+
+Ejemplo:
+    python benchmarks/storage_benchmark.py --transactions 200000 --alerts 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def measure(label, func, rounds):
+    """Ejecuta func varias veces e imprime el tiempo promedio"""
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    avg = sum(times) / len(times)
+    print(f"  {label:<38} promedio {avg * 1000:9.1f} ms | mejor {min(times) * 1000:9.1f} ms")
+
+def throughput(label, count, func):
+    """Ejecuta func una vez e imprime filas por segundo"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<38} {count / elapsed:12,.0f} filas/s ({elapsed:.2f} s)")
+
+def synthetic_transactions(count, symbols, rng):
+    for i in range(count):
+        yield (f"20{15 + i % 10}-{1 + i % 12:02d}-{1 + i % 28:02d}", rng.choice(symbols),
+               round(rng.uniform(1, 500), 2), rng.choice([1, 2, 5, 10, -1]), 0)
+
+def reset_database(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de perfiles de almacenamiento SQLite")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "trader_storage_benchmark.db"),
+                        help="Archivo de la base sintética (se borra en cada perfil)")
+    parser.add_argument("--profiles", nargs="+", help="Perfiles a medir (todos por defecto)")
+    parser.add_argument("--transactions", type=int, default=100000, help="Transacciones importadas en bloque")
+    parser.add_argument("--single-inserts", type=int, default=1000, help="Inserciones individuales (un commit cada una)")
+    parser.add_argument("--alerts", type=int, default=20000, help="Alertas generadas")
+    parser.add_argument("--symbols", type=int, default=200, help="Símbolos distintos")
+    parser.add_argument("--rounds", type=int, default=5, help="Repeticiones por medición de lectura")
+    args = parser.parse_args()
+
+    # La base sintética debe configurarse antes de importar database
+    os.environ["TRADER_DB_PATH"] = args.db
+    reset_database(args.db)
+
+    import database
+    from api.providers import ReplayProvider
+    from api.yahoo_finance import yahoo_api
+
+    # Se mide la base de datos, no el proveedor: los símbolos sintéticos no
+    # se piden (negative cache) y el portafolio se valúa al costo
+    yahoo_api.set_provider(ReplayProvider(data_dir=tempfile.mkdtemp(), seed=42))
+    profiles = args.profiles or list(database.STORAGE_PROFILES)
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    for symbol in symbols:
+        yahoo_api.negative_cache.add(symbol, "símbolo sintético")
+
+    for profile in profiles:
+        print(f"\nPerfil: {profile} {database.STORAGE_PROFILES[profile]}")
+        database.close_connection()
+        reset_database(args.db)
+        database.set_storage_profile(profile)
+        database.migrate()
+        rng = random.Random(42)
+
+        throughput("import_transacciones (bloques)", args.transactions,
+                   lambda: database.import_transacciones(synthetic_transactions(args.transactions, symbols, rng)))
+
+        def single_inserts():
+            for fecha, simbolo, precio, cantidad, comisiones in synthetic_transactions(args.single_inserts, symbols, rng):
+                database.insert_transaccion(fecha, simbolo, precio, cantidad, comisiones)
+        throughput("insert_transaccion (individual)", args.single_inserts, single_inserts)
+
+        def alerts():
+            for i in range(args.alerts):
+                database.insert_alerta(rng.choice(symbols), rng.choice(["buy_opportunity", "overbought"]),
+                                       100.0, 95.0, 5.0, f"Alerta sintética {i}")
+        throughput("insert_alerta (individual)", args.alerts, alerts)
+
+        measure("get_portfolio_with_current_prices", database.get_portfolio_with_current_prices, args.rounds)
+        measure("get_alertas()", database.get_alertas, args.rounds)
+        measure("get_alertas(simbolo)", lambda: database.get_alertas(rng.choice(symbols)), args.rounds)
+        measure("get_alertas(no_leidas=True)", lambda: database.get_alertas(no_leidas=True), args.rounds)
+
+    database.close_connection()
+    reset_database(args.db)
+
+if __name__ == "__main__":
+    main()
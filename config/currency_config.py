@@ -5,7 +5,7 @@ class CurrencyConfig:
     def __init__(self):
         self.config_file = "currency_config.json"
         self.default_currency = "MXN"  # Moneda por defecto: Pesos Mexicanos
-        self.available_currencies = ["MXN", "USD"]
+        self.available_currencies = ["MXN", "USD", "EUR"]
         self.load_config()
     
     def load_config(self):
@@ -47,6 +47,8 @@ class CurrencyConfig:
             return "$"
         elif self.default_currency == "USD":
             return "US$"
+        elif self.default_currency == "EUR":
+            return "€"
         return "$"
     
     def get_currency_name(self):
@@ -55,6 +57,8 @@ class CurrencyConfig:
             return "Pesos Mexicanos"
         elif self.default_currency == "USD":
             return "Dólares Americanos"
+        elif self.default_currency == "EUR":
+            return "Euros"
         return "Moneda"
 
 # Instancia global
@@ -1,86 +1,461 @@
+import csv
+import os
 import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime
 from sqlite3 import Error
 from config.currency_config import currency_config
 
-# Variable global para la conexión (patron singleton)
-_connection = None
+DB_PATH = os.environ.get("TRADER_DB_PATH", 'base_datos_trader_LJ.db')
+
+# Perfiles de almacenamiento: PRAGMAs por conexión y tamaño del cache de sentencias.
+# cache_size negativo es en KiB; mmap_size en bytes
+STORAGE_PROFILES = {
+    # Uso normal de la aplicación: escrituras pequeñas y durables (WAL + NORMAL)
+    "interactive": {
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "cached_statements": 128,
+    },
+    # Importaciones masivas: sin fsync por transacción y cache grande
+    "bulk-load": {
+        "synchronous": "OFF",
+        "cache_size": -262144,
+        "mmap_size": 0,
+        "temp_store": "MEMORY",
+        "cached_statements": 256,
+    },
+    # Consultas y reportes sobre tablas grandes
+    "read-heavy": {
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 512 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "cached_statements": 256,
+    },
+}
+DEFAULT_STORAGE_PROFILE = os.environ.get("TRADER_DB_PROFILE", "interactive")
+
+class ConnectionManager:
+    """
+    Conexiones a la base de datos compartidas entre hilos:
+    - Una sola conexión de escritura; las escrituras se serializan con un lock.
+    - Una conexión de solo lectura por hilo, que en modo WAL puede leer
+      mientras otro hilo escribe.
+    """
+
+    def __init__(self, db_path=DB_PATH, profile=DEFAULT_STORAGE_PROFILE):
+        self.db_path = db_path
+        self.profile = profile if profile in STORAGE_PROFILES else "interactive"
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._generation = 0  # Cambia al cerrar; invalida las conexiones de lectura
+
+    def _connect(self, read_only=False):
+        settings = STORAGE_PROFILES[self.profile]
+        conn = sqlite3.connect(self.db_path, check_same_thread=read_only, timeout=30,
+                               cached_statements=settings["cached_statements"])
+        if not read_only:
+            # Debe ir antes de WAL y de la primera tabla: solo surte efecto en
+            # bases nuevas (las existentes usan habilitar_vacuum_incremental)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        for pragma in ("synchronous", "cache_size", "mmap_size", "temp_store"):
+            conn.execute(f"PRAGMA {pragma}={settings[pragma]}")
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def set_profile(self, profile):
+        """Cambiar el perfil de almacenamiento; las conexiones se reabren con él"""
+        if profile not in STORAGE_PROFILES:
+            raise ValueError(f"Perfil de almacenamiento desconocido: {profile}")
+        self.profile = profile
+        self.close()
+
+    def _get_writer(self):
+        """Conexión de escritura; solo se entrega a través de write()"""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+                print("Conexión a SQLite establecida")
+            return self._writer
+
+    @contextmanager
+    def write(self):
+        """
+        Tomar la conexión de escritura en exclusiva (None si no se pudo
+        abrir); al salir se revierte lo que no se haya confirmado
+        """
+        with self._write_lock:
+            try:
+                conn = self._get_writer()
+            except Error as e:
+                print(f"Error al conectar a SQLite: {e}")
+                conn = None
+            try:
+                yield conn
+            finally:
+                if conn is not None and conn.in_transaction:
+                    conn.rollback()
+
+    def get_reader(self):
+        """Conexión de solo lectura del hilo actual"""
+        reader = getattr(self._local, 'reader', None)
+        if reader is not None and reader[0] == self._generation:
+            return reader[1]
+
+        conn = self._connect(read_only=True)
+        self._local.reader = (self._generation, conn)
+        with self._readers_lock:
+            self._readers.append(conn)
+        return conn
+
+    def close(self):
+        """Cerrar todas las conexiones (se vuelven a abrir al usarse)"""
+        with self._write_lock:
+            with self._readers_lock:
+                self._generation += 1
+                readers, self._readers = self._readers, []
+            for conn in readers:
+                try:
+                    conn.close()
+                except Error:
+                    # Conexión de otro hilo: se libera cuando el hilo termine
+                    pass
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+                print("Conexiòn a SQLite cerrada")
+
+# Instancia global (patrón singleton)
+db_manager = ConnectionManager()
 
 def get_connection():
-    """Obtiene la conexiòn única a la base de datos"""
-    global _connection
-    if _connection is None:
-        try:
-            _connection = sqlite3.connect(
-                'base_datos_trader_LJ.db',
-                check_same_thread=False,
-                timeout=30
-            )
-            _connection.execute("PRAGMA journal_mode=WAL")
-            print("Conexión a SQLite establecida")
-        except Error as e:
-            print(f"Error al conectar a SQLite: {e}")
-            return None
-    return _connection
+    """
+    Obtiene una conexión de solo lectura (la del hilo actual). Para escribir
+    se usa with write_connection() as conn, que serializa las escrituras
+    """
+    return get_read_connection()
+
+def get_read_connection():
+    """Obtiene la conexión de solo lectura del hilo actual"""
+    try:
+        return db_manager.get_reader()
+    except Error as e:
+        print(f"Error al conectar a SQLite: {e}")
+        return None
+
+def write_connection():
+    """Conexión de escritura en exclusiva: with write_connection() as conn"""
+    return db_manager.write()
+
+def set_storage_profile(profile):
+    """Usar uno de STORAGE_PROFILES (interactive, bulk-load, read-heavy)"""
+    db_manager.set_profile(profile)
 
 def close_connection():
-    """Cierra la conexión a la base de datos"""
-    global _connection
-    if _connection:
-        _connection.close()
-        _connection = None
-        print("Conexiòn a SQLite cerrada")
+    """Cierra las conexiones a la base de datos"""
+    db_manager.close()
 
-def create_tables():
-    """Crea las tablas necesarias para el portafolio"""
-    conn = get_connection()
-    if conn:
-        sql_create_activos = """
-        CREATE TABLE IF NOT EXISTS activos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            simbolo TEXT UNIQUE NOT NULL,
-            nombre TEXT,
-            tipo TEXT CHECK(tipo IN('accion','cripto','etf','cetes','otro_varaible','otro_fija'))
-        );"""
-
-        sql_create_transacciones = """
-        CREATE TABLE IF NOT EXISTS transacciones (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fecha DATE NOT NULL,
-            simbolo TEXT NOT NULL,
-            precio REAL NOT NULL,
-            cantidad REAL NOT NULL,
-            comisiones REAL DEFAULT 0,
-            FOREIGN KEY (simbolo) REFERENCES activos (simbolo)
-        )"""
-
-        sql_create_alertas = """
-        CREATE TABLE IF NOT EXISTS alertas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            simbolo TEXT NOT NULL,
-            tipo_alerta TEXT NOT NULL,
-            precio_actual REAL NOT NULL,
-            precio_referencia REAL NOT NULL,
-            desviacion REAL NOT NULL,
-            mensaje TEXT NOT NULL,
-            leida BOOLEAN DEFAULT FALSE,
-            FOREIGN KEY (simbolo) REFERENCES activos (simbolo)
-        );
-        """
+# Cantidad por debajo de la cual una posición se considera cerrada (redondeo)
+POSITION_EPSILON = 1e-9
+
+SQL_UPSERT_POSICION = """
+    INSERT INTO posiciones(simbolo, cantidad, inversion, precio_promedio, num_transacciones)
+    VALUES(:simbolo, :cantidad, :inversion,
+           CASE WHEN :cantidad > 0 THEN :inversion / :cantidad ELSE 0 END, :num)
+    ON CONFLICT(simbolo) DO UPDATE SET
+        cantidad = cantidad + excluded.cantidad,
+        inversion = inversion + excluded.inversion,
+        precio_promedio = CASE WHEN cantidad + excluded.cantidad > 0
+                               THEN (inversion + excluded.inversion) / (cantidad + excluded.cantidad)
+                               ELSE 0 END,
+        num_transacciones = num_transacciones + excluded.num_transacciones
+"""
+
+SQL_REBUILD_POSICIONES = """
+    INSERT INTO posiciones(simbolo, cantidad, inversion, precio_promedio, num_transacciones)
+    SELECT
+        simbolo,
+        SUM(cantidad),
+        SUM(precio * cantidad),
+        CASE WHEN SUM(cantidad) > 0 THEN SUM(precio * cantidad) / SUM(cantidad) ELSE 0 END,
+        COUNT(*)
+    FROM transacciones
+    GROUP BY simbolo
+"""
+
+# Fila de alertas_resumen con los contadores de todas las alertas
+ALERTAS_TOTAL = "_TOTAL"
+
+# alertas_resumen desde alertas y alertas_archivo (migración y reparación)
+SQL_REBUILD_RESUMEN_ALERTAS = f"""
+    WITH por_simbolo AS (
+        SELECT simbolo, SUM(total) AS total, SUM(no_leidas) AS no_leidas,
+               SUM(archivadas) AS archivadas, MAX(ultima_alerta) AS ultima_alerta
+        FROM (
+            SELECT simbolo, COUNT(*) AS total, SUM(leida = FALSE) AS no_leidas,
+                   0 AS archivadas, MAX(fecha) AS ultima_alerta
+            FROM alertas GROUP BY simbolo
+            UNION ALL
+            SELECT simbolo, COUNT(*), SUM(leida = FALSE), COUNT(*), MAX(fecha)
+            FROM alertas_archivo GROUP BY simbolo
+        )
+        GROUP BY simbolo
+    )
+    INSERT INTO alertas_resumen(simbolo, total, no_leidas, archivadas, ultima_alerta)
+    SELECT simbolo, total, no_leidas, archivadas, ultima_alerta FROM por_simbolo
+    UNION ALL
+    SELECT '{ALERTAS_TOTAL}', COALESCE(SUM(total), 0), COALESCE(SUM(no_leidas), 0),
+           COALESCE(SUM(archivadas), 0), MAX(ultima_alerta)
+    FROM por_simbolo
+"""
+
+# Migraciones del esquema
+
+def _migracion_tablas_base(cursor):
+    """Tablas originales y resumen de posiciones"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS activos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        simbolo TEXT UNIQUE NOT NULL,
+        nombre TEXT,
+        tipo TEXT CHECK(tipo IN('accion','cripto','etf','cetes','otro_varaible','otro_fija'))
+    );""")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS transacciones (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha DATE NOT NULL,
+        simbolo TEXT NOT NULL,
+        precio REAL NOT NULL,
+        cantidad REAL NOT NULL,
+        comisiones REAL DEFAULT 0,
+        FOREIGN KEY (simbolo) REFERENCES activos (simbolo)
+    )""")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS alertas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        simbolo TEXT NOT NULL,
+        tipo_alerta TEXT NOT NULL,
+        precio_actual REAL NOT NULL,
+        precio_referencia REAL NOT NULL,
+        desviacion REAL NOT NULL,
+        mensaje TEXT NOT NULL,
+        leida BOOLEAN DEFAULT FALSE,
+        FOREIGN KEY (simbolo) REFERENCES activos (simbolo)
+    );""")
+
+    # Resumen por símbolo de transacciones, actualizado en insert_transaccion
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS posiciones (
+        simbolo TEXT PRIMARY KEY,
+        cantidad REAL NOT NULL DEFAULT 0,
+        inversion REAL NOT NULL DEFAULT 0,
+        precio_promedio REAL NOT NULL DEFAULT 0,
+        num_transacciones INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID""")
+
+    # Bases de datos anteriores a la tabla posiciones
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM posiciones)")
+    if not cursor.fetchone()[0]:
+        cursor.execute(SQL_REBUILD_POSICIONES)
+
+def _migracion_indices(cursor):
+    """Índices para las consultas frecuentes de alertas y transacciones"""
+    # Cooldown de AlertManager: última alerta por símbolo y tipo
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alertas_simbolo_tipo_fecha ON alertas(simbolo, tipo_alerta, fecha DESC)")
+    # get_alertas(simbolo) ordenado por fecha
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alertas_simbolo_fecha ON alertas(simbolo, fecha DESC)")
+    # Alertas no leídas y listados generales por fecha
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alertas_leida_fecha ON alertas(leida, fecha)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alertas_fecha ON alertas(fecha)")
+    # get_transacciones(simbolo)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transacciones_simbolo_fecha ON transacciones(simbolo, fecha)")
+    cursor.execute("ANALYZE")
+
+def _migracion_indice_transacciones_fecha(cursor):
+    """Recorrido de todas las transacciones en orden (fecha, id) para la paginación"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transacciones_fecha ON transacciones(fecha)")
+
+def _migracion_valuaciones(cursor):
+    """Foto diaria del valor de cada posición y del total del portafolio"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS valuaciones (
+        simbolo TEXT NOT NULL,
+        fecha TEXT NOT NULL,
+        cantidad REAL NOT NULL,
+        precio REAL,
+        valor REAL NOT NULL,
+        inversion REAL NOT NULL,
+        valor_usd REAL NOT NULL,
+        PRIMARY KEY (simbolo, fecha)
+    ) WITHOUT ROWID""")
+    # Invalidación de las fotos a partir de una fecha
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_valuaciones_fecha ON valuaciones(fecha)")
+
+def _migracion_archivo_alertas(cursor):
+    """Archivo de alertas leídas antiguas y conteos diarios de lo archivado"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS alertas_archivo (
+        id INTEGER PRIMARY KEY,
+        fecha TIMESTAMP,
+        simbolo TEXT NOT NULL,
+        tipo_alerta TEXT NOT NULL,
+        precio_actual REAL NOT NULL,
+        precio_referencia REAL NOT NULL,
+        desviacion REAL NOT NULL,
+        mensaje TEXT NOT NULL,
+        leida BOOLEAN DEFAULT TRUE
+    )""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alertas_archivo_simbolo_fecha ON alertas_archivo(simbolo, fecha DESC)")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS alertas_diarias (
+        simbolo TEXT NOT NULL,
+        tipo_alerta TEXT NOT NULL,
+        fecha TEXT NOT NULL,
+        total INTEGER NOT NULL,
+        PRIMARY KEY (simbolo, tipo_alerta, fecha)
+    ) WITHOUT ROWID""")
+
+def _migracion_resumen_alertas(cursor):
+    """Contadores de alertas por símbolo y globales, mantenidos con triggers"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS alertas_resumen (
+        simbolo TEXT PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0,
+        no_leidas INTEGER NOT NULL DEFAULT 0,
+        archivadas INTEGER NOT NULL DEFAULT 0,
+        ultima_alerta TIMESTAMP
+    ) WITHOUT ROWID""")
+
+    # Nueva alerta: suma en su símbolo y en la fila global
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_alertas_resumen_insert AFTER INSERT ON alertas
+    BEGIN
+        INSERT INTO alertas_resumen(simbolo, total, no_leidas, ultima_alerta)
+        VALUES (NEW.simbolo, 1, NEW.leida = FALSE, NEW.fecha),
+               ('{ALERTAS_TOTAL}', 1, NEW.leida = FALSE, NEW.fecha)
+        ON CONFLICT(simbolo) DO UPDATE SET
+            total = total + 1,
+            no_leidas = no_leidas + excluded.no_leidas,
+            ultima_alerta = CASE WHEN ultima_alerta IS NULL OR excluded.ultima_alerta > ultima_alerta
+                                 THEN excluded.ultima_alerta ELSE ultima_alerta END;
+    END""")
+
+    # marcar_alerta_leida
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_alertas_resumen_leida AFTER UPDATE OF leida ON alertas
+    WHEN OLD.leida IS NOT NEW.leida
+    BEGIN
+        UPDATE alertas_resumen
+        SET no_leidas = no_leidas + (NEW.leida = FALSE) - (OLD.leida = FALSE)
+        WHERE simbolo IN (NEW.simbolo, '{ALERTAS_TOTAL}');
+    END""")
+
+    # Borrado (el archivado lo compensa con el trigger de alertas_archivo)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_alertas_resumen_delete AFTER DELETE ON alertas
+    BEGIN
+        UPDATE alertas_resumen
+        SET total = total - 1, no_leidas = no_leidas - (OLD.leida = FALSE)
+        WHERE simbolo IN (OLD.simbolo, '{ALERTAS_TOTAL}');
+    END""")
+
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_alertas_resumen_archivo AFTER INSERT ON alertas_archivo
+    BEGIN
+        UPDATE alertas_resumen
+        SET total = total + 1, no_leidas = no_leidas + (NEW.leida = FALSE), archivadas = archivadas + 1
+        WHERE simbolo IN (NEW.simbolo, '{ALERTAS_TOTAL}');
+    END""")
+
+    cursor.execute("DELETE FROM alertas_resumen")
+    cursor.execute(SQL_REBUILD_RESUMEN_ALERTAS)
 
+# (versión, descripción, función). La versión aplicada se guarda en PRAGMA user_version
+MIGRATIONS = [
+    (1, "Tablas base y posiciones", _migracion_tablas_base),
+    (2, "Índices de alertas y transacciones", _migracion_indices),
+    (3, "Índice de transacciones por fecha", _migracion_indice_transacciones_fecha),
+    (4, "Valuaciones diarias del portafolio", _migracion_valuaciones),
+    (5, "Archivo y conteos diarios de alertas", _migracion_archivo_alertas),
+    (6, "Resumen de alertas mantenido con triggers", _migracion_resumen_alertas),
+]
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate():
+    """
+    Aplicar las migraciones pendientes, cada una en su propia transacción.
+    Si el esquema está al día solo se lee PRAGMA user_version
+    """
+    with write_connection() as conn:
+        if not conn:
+            return False
         try:
-            cursor = conn.cursor()
-            cursor.execute(sql_create_activos)
-            cursor.execute(sql_create_transacciones)
-            cursor.execute(sql_create_alertas)
-            conn.commit()
-            print("Tablas creadas exitosamente")
+            version = get_schema_version(conn)
+            for number, description, migration in MIGRATIONS:
+                if number <= version:
+                    continue
+                cursor = conn.cursor()
+                cursor.execute("BEGIN")
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {int(number)}")
+                conn.commit()
+                print(f"Migración {number} aplicada: {description}")
+            return True
         except Error as e:
-            print(f"Error al crear tablas: {e}")
+            print(f"Error al migrar la base de datos: {e}")
+            return False
+
+def create_tables():
+    """Crea las tablas necesarias para el portafolio (aplica las migraciones pendientes)"""
+    return migrate()
+
+def rebuild_resumen_alertas():
+    """Recalcular alertas_resumen desde alertas y alertas_archivo (reparación)"""
+    with write_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM alertas_resumen")
+                cursor.execute(SQL_REBUILD_RESUMEN_ALERTAS)
+                conn.commit()
+                return True
+            except Error as e:
+                print(f"Error al reconstruir el resumen de alertas: {e}")
+                return False
+
+def rebuild_posiciones():
+    """Reconstruir la tabla posiciones desde todas las transacciones (reparación)"""
+    with write_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM posiciones")
+                cursor.execute(SQL_REBUILD_POSICIONES)
+                conn.commit()
+                print(f"Posiciones reconstruidas: {cursor.rowcount} símbolos")
+                return True
+            except Error as e:
+                print(f"Error al reconstruir posiciones: {e}")
+                return False
 
 def get_activos():
     """Obotiene todos los activos de la base de datos"""
-    conn = get_connection()
+    conn = get_read_connection()
     if conn:
         try:
             cursor = conn.cursor()
@@ -92,35 +467,170 @@ def get_activos():
 
 # Funciòn para insertar un activo
 def insert_activo(simbolo,nombre,tipo):
-    conn = get_connection()
+    with write_connection() as conn:
+        if conn:
+            try:
+                sql = """ INSERT INTO activos(simbolo,nombre,tipo) VALUES(?,?,?)"""
+                cursor = conn.cursor()
+                cursor.execute(sql,(simbolo,nombre,tipo))
+                conn.commit()
+                return cursor.lastrowid
+            except Error as e:
+                print(f"Error al insertar activo: {e}")
+            return None
+
+# Función para insertar una transaccion
+def insert_transaccion(fecha,simbolo,precio,cantidad,comisiones=0):
+    with write_connection() as conn:
+        if conn:
+            try:
+                sql = """INSERT INTO transacciones(fecha,simbolo,precio,cantidad,comisiones) VALUES(?,?,?,?,?)"""
+                cursor = conn.cursor()
+                cursor.execute(sql,(fecha,simbolo,precio,cantidad,comisiones))
+                # Misma transacción: la posición nunca queda desfasada
+                conn.execute(SQL_UPSERT_POSICION, {'simbolo': simbolo, 'cantidad': cantidad,
+                                                   'inversion': precio * cantidad, 'num': 1})
+                # Las fotos diarias desde esa fecha ya no son válidas
+                conn.execute("DELETE FROM valuaciones WHERE fecha >= ?", (fecha,))
+                conn.commit()
+                return cursor.lastrowid
+            except Error as e:
+                print(f"Error al insertar transaccion: {e}")
+                return None
+
+# Columnas aceptadas por la importación masiva (nombre y tipo son opcionales)
+IMPORT_COLUMNS = ('fecha', 'simbolo', 'precio', 'cantidad', 'comisiones', 'nombre', 'tipo')
+# Valores permitidos por el CHECK de activos.tipo
+TIPOS_ACTIVO = ('accion', 'cripto', 'etf', 'cetes', 'otro_varaible', 'otro_fija')
+
+def _parse_fecha(valor):
+    """Fecha de transacción normalizada a YYYY-MM-DD (ValueError si no es ISO)"""
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if valor is None or not str(valor).strip():
+        raise ValueError("fecha vacía")
+    texto = str(valor).strip()
+    try:
+        return datetime.fromisoformat(texto).date().isoformat()
+    except ValueError:
+        raise ValueError(f"fecha inválida {texto!r} (se espera YYYY-MM-DD)")
+
+def _parse_import_row(row, tipo_por_defecto):
+    """Fila (dict o secuencia en el orden de IMPORT_COLUMNS) -> (transacción, activo)"""
+    if not isinstance(row, dict):
+        row = dict(zip(IMPORT_COLUMNS, row))
+    fecha = _parse_fecha(row['fecha'])
+    simbolo = str(row['simbolo'] or '').strip().upper()
+    if not simbolo:
+        raise ValueError("símbolo vacío")
+    precio = float(row['precio'])
+    cantidad = float(row['cantidad'])
+    comisiones = float(row.get('comisiones') or 0)
+    nombre = row.get('nombre') or simbolo
+    tipo = str(row.get('tipo') or tipo_por_defecto).strip().lower()
+    if tipo not in TIPOS_ACTIVO:
+        raise ValueError(f"tipo inválido {tipo!r}")
+    return (fecha, simbolo, precio, cantidad, comisiones), (simbolo, nombre, tipo)
+
+def _import_chunk(conn, transacciones, activos):
+    """Insertar un bloque de transacciones en una sola transacción de SQLite"""
+    posiciones = defaultdict(lambda: {'cantidad': 0.0, 'inversion': 0.0, 'num': 0})
+    for fecha, simbolo, precio, cantidad, comisiones in transacciones:
+        posicion = posiciones[simbolo]
+        posicion['cantidad'] += cantidad
+        posicion['inversion'] += precio * cantidad
+        posicion['num'] += 1
+
+    with conn:
+        # Solo se ignora el activo ya existente; otras violaciones de restricciones abortan el bloque
+        conn.executemany("INSERT INTO activos(simbolo,nombre,tipo) VALUES(?,?,?) ON CONFLICT(simbolo) DO NOTHING",
+                         list(activos.values()))
+        conn.executemany("INSERT INTO transacciones(fecha,simbolo,precio,cantidad,comisiones) VALUES(?,?,?,?,?)",
+                         transacciones)
+        conn.executemany(SQL_UPSERT_POSICION,
+                         [dict(simbolo=simbolo, **posicion) for simbolo, posicion in posiciones.items()])
+        conn.execute("DELETE FROM valuaciones WHERE fecha >= ?", (min(t[0] for t in transacciones),))
+
+def import_transacciones(rows, chunk_size=5000, tipo_por_defecto='accion'):
+    """
+    Importación masiva de transacciones desde un iterable de filas (dicts
+    con las claves de IMPORT_COLUMNS o secuencias en ese orden). Se procesa
+    en bloques de chunk_size: cada bloque crea los activos que falten e
+    inserta sus transacciones con executemany en una sola transacción.
+    Las filas inválidas (fecha no ISO, símbolo vacío, números o tipo de
+    activo inválidos) se omiten. Devuelve (insertadas, omitidas)
+    """
+    insertadas = 0
+    omitidas = 0
+    transacciones = []
+    activos = {}
+
+    with write_connection() as conn:
+        if not conn:
+            return 0, 0
+        try:
+            for numero, row in enumerate(rows, start=1):
+                try:
+                    transaccion, activo = _parse_import_row(row, tipo_por_defecto)
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"Fila {numero} omitida: {e}")
+                    omitidas += 1
+                    continue
+
+                transacciones.append(transaccion)
+                activos.setdefault(activo[0], activo)
+                if len(transacciones) >= chunk_size:
+                    _import_chunk(conn, transacciones, activos)
+                    insertadas += len(transacciones)
+                    transacciones, activos = [], {}
+
+            if transacciones:
+                _import_chunk(conn, transacciones, activos)
+                insertadas += len(transacciones)
+        except Error as e:
+            print(f"Error en la importación masiva (bloques ya confirmados: {insertadas} filas): {e}")
+
+    print(f"Importación terminada: {insertadas} transacciones, {omitidas} filas omitidas")
+    return insertadas, omitidas
+
+def import_transacciones_csv(path, chunk_size=5000, tipo_por_defecto='accion', **csv_options):
+    """
+    Importar transacciones desde un CSV con encabezados fecha, simbolo,
+    precio, cantidad y opcionalmente comisiones, nombre y tipo.
+    El archivo se lee como flujo, sin cargarlo completo en memoria
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f, **csv_options)
+        rows = ({key.strip().lower(): value for key, value in row.items() if key} for row in reader)
+        return import_transacciones(rows, chunk_size, tipo_por_defecto)
+
+def get_tipos_activos():
+    """{simbolo: tipo} de todos los activos"""
+    conn = get_read_connection()
     if conn:
         try:
-            sql = """ INSERT INTO activos(simbolo,nombre,tipo) VALUES(?,?,?)"""
-            cursor = conn.cursor()
-            cursor.execute(sql,(simbolo,nombre,tipo))
-            conn.commit()
-            return cursor.lastrowid
+            return dict(conn.execute("SELECT simbolo, tipo FROM activos").fetchall())
         except Error as e:
-            print(f"Error al insertar activo: {e}")
-        return None
+            print(f"Error al obtener tipos de activos: {e}")
+    return {}
 
-# Función para insertar una transaccion
-def insert_transaccion(fecha,simbolo,precio,cantidad,comisiones=0):
-    conn = get_connection()
+def get_activo(simbolo):
+    """Obtiene el activo con ese símbolo o None"""
+    conn = get_read_connection()
     if conn:
         try:
-            sql = """INSERT INTO transacciones(fecha,simbolo,precio,cantidad,comisiones) VALUES(?,?,?,?,?)"""
             cursor = conn.cursor()
-            cursor.execute(sql,(fecha,simbolo,precio,cantidad,comisiones))
-            conn.commit()
-            return cursor.lastrowid
+            cursor.execute("SELECT * FROM activos WHERE simbolo = ?", (simbolo,))
+            return cursor.fetchone()
         except Error as e:
-            print(f"Error al insertar transaccion: {e}")
+            print(f"Error al obtener activo: {e}")
             return None
 
 # Funciòn para consultar transacciones
 def get_transacciones(simbolo=None):
-    conn = get_connection()
+    conn = get_read_connection()
     if conn:
         try:
             cursor = conn.cursor()
@@ -135,20 +645,19 @@ def get_transacciones(simbolo=None):
         
 def get_portfolio_data():
     """Obtiene datos agrupados para el portafolio"""
-    conn = get_connection()
+    conn = get_read_connection()
     if conn:
         try:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT 
-                    t.simbolo,
+                    p.simbolo,
                     a.nombre,
-                    SUM(t.cantidad) as cantidad_total,
-                    SUM(t.precio * t.cantidad) / SUM(t.cantidad) as precio_promedio,
-                    SUM(t.precio * t.cantidad) as inversion_total
-                FROM transacciones t
-                JOIN activos a ON t.simbolo = a.simbolo
-                GROUP BY t.simbolo
+                    p.cantidad as cantidad_total,
+                    p.precio_promedio,
+                    p.inversion as inversion_total
+                FROM posiciones p
+                JOIN activos a ON p.simbolo = a.simbolo
             """)
             return cursor.fetchall()
         except Error as e:
@@ -157,11 +666,11 @@ def get_portfolio_data():
         
 def get_all_symbols():
     """Obtiene todos los sìmbolos ùnicos de la base de datos"""
-    conn = get_connection()
+    conn = get_read_connection()
     if conn:
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT DISTINCT simbolo FROM transacciones")
+            cursor.execute("SELECT simbolo FROM posiciones")
             symbols = [row[0] for row in cursor.fetchall()]
             return symbols
         except Error as e:
@@ -172,63 +681,58 @@ def get_portfolio_with_current_prices():
     """Obtener el portafolio con precios actualizados en la moneda configurada"""
     from api.yahoo_finance import yahoo_api
     
-    conn = get_connection()
+    conn = get_read_connection()
     if conn:
         try:
             cursor = conn.cursor()
             
             cursor.execute("""
                 SELECT 
-                    t.simbolo,
-                    COALESCE(a.nombre, t.simbolo) as nombre,
-                    SUM(t.cantidad) as cantidad_total,
-                    CASE 
-                        WHEN SUM(t.cantidad) > 0 THEN SUM(t.precio * t.cantidad) / SUM(t.cantidad)
-                        ELSE 0 
-                    END as precio_promedio,
-                    SUM(t.precio * t.cantidad) as inversion_total
-                FROM transacciones t
-                LEFT JOIN activos a ON t.simbolo = a.simbolo
-                GROUP BY t.simbolo
-                HAVING SUM(t.cantidad) > 0
-            """)
+                    p.simbolo,
+                    COALESCE(a.nombre, p.simbolo) as nombre,
+                    p.cantidad as cantidad_total,
+                    p.precio_promedio,
+                    p.inversion as inversion_total
+                FROM posiciones p
+                LEFT JOIN activos a ON p.simbolo = a.simbolo
+                WHERE p.cantidad > ?
+            """, (POSITION_EPSILON,))
             
             portfolio = cursor.fetchall()
             symbols = [asset[0] for asset in portfolio if asset[0]]
             
-            # Obtener precios actuales en la moneda configurada
+            # Precios actuales en la moneda nativa de cada activo
             current_prices = {}
             if symbols:
-                current_prices = yahoo_api.get_multiple_prices(symbols, currency_config.get_currency())
+                current_prices = yahoo_api.get_native_prices(symbols)
             
-            # Obtener tipo de cambio actual para conversiones
-            exchange_rate = yahoo_api.get_usd_mxn_rate()
+            # Factor moneda nativa -> moneda configurada (una tasa por moneda)
+            currency = currency_config.get_currency()
+            factors = yahoo_api.fx.get_conversion_factors(symbols, currency)
             
             portfolio_with_prices = []
             for asset in portfolio:
                 symbol, name, quantity, avg_price, total_invested = asset
                 
-                current_price = current_prices.get(symbol, avg_price)
+                # Los precios en DB están en la moneda nativa del activo; sin
+                # tipo de cambio el activo se deja en esa moneda
+                factor = factors.get(symbol)
+                asset_currency = currency
+                if factor is None:
+                    factor = yahoo_api.fx.get_unit_scale(symbol)
+                    asset_currency = yahoo_api.fx.get_native_currency(symbol)
+                current_price = current_prices.get(symbol, avg_price) * factor
                 current_value = quantity * current_price
                 
-                # Convertir precios promedio si es necesario
-                if currency_config.get_currency() == "MXN":
-                    # Asumimos que los precios en DB están en USD
-                    avg_price_mxn = avg_price * exchange_rate
-                    total_invested_mxn = total_invested * exchange_rate
-                else:
-                    avg_price_mxn = avg_price
-                    total_invested_mxn = total_invested
-                
                 portfolio_with_prices.append({
                     'symbol': symbol,
                     'name': name,
                     'quantity': quantity,
-                    'avg_price': avg_price_mxn,
-                    'total_invested': total_invested_mxn,
+                    'avg_price': avg_price * factor,
+                    'total_invested': total_invested * factor,
                     'current_price': current_price,
                     'current_value': current_value,
-                    'currency': currency_config.get_currency()
+                    'currency': asset_currency
                 })
             
             return portfolio_with_prices
@@ -239,7 +743,7 @@ def get_portfolio_with_current_prices():
 
 def debug_portfolio_data():
     """Función para debuggear los datos del portafolio"""
-    conn = get_connection()
+    conn = get_read_connection()
     if conn:
         try:
             print("=== DEBUG: DATOS EN TABLAS ===")
@@ -272,22 +776,36 @@ def debug_portfolio_data():
         
 def insert_alerta(simbolo, tipo_alerta, precio_actual, precio_referencia, desviacion, mensaje):
     """Insertar una nueva alerta en la base de datos"""
-    conn = get_connection()
+    with write_connection() as conn:
+        if conn:
+            try:
+                sql = """INSERT INTO alertas (simbolo, tipo_alerta, precio_actual, precio_referencia, desviacion, mensaje)
+                         VALUES(?,?,?,?,?,?)"""
+                cursor = conn.cursor()
+                cursor.execute(sql, (simbolo, tipo_alerta, precio_actual, precio_referencia, desviacion, mensaje))
+                conn.commit()
+                return cursor.lastrowid
+            except Error as e:
+                print(f"Error al insertar alerta: {e}")
+                return None
+
+def get_ultima_alerta(simbolo, tipo_alerta):
+    """Fecha de la última alerta de ese tipo para el símbolo (None si no hay)"""
+    conn = get_read_connection()
     if conn:
         try:
-            sql = """INSERT INTO alertas (simbolo, tipo_alerta, precio_actual, precio_referencia, desviacion, mensaje)
-                     VALUES(?,?,?,?,?,?)"""
             cursor = conn.cursor()
-            cursor.execute(sql, (simbolo, tipo_alerta, precio_actual, precio_referencia, desviacion, mensaje))
-            conn.commit()
-            return cursor.lastrowid
+            cursor.execute("""SELECT fecha FROM alertas WHERE simbolo=? AND tipo_alerta=?
+                              ORDER BY fecha DESC LIMIT 1""", (simbolo, tipo_alerta))
+            row = cursor.fetchone()
+            return row[0] if row else None
         except Error as e:
-            print(f"Error al insertar alerta: {e}")
+            print(f"Error al obtener última alerta: {e}")
             return None
 
 def get_alertas(simbolo=None, no_leidas=False):
     """Obtener alertas de la base de datos"""
-    conn = get_connection()
+    conn = get_read_connection()
     if conn:
         try:
             cursor = conn.cursor()
@@ -309,47 +827,451 @@ def get_alertas(simbolo=None, no_leidas=False):
 
 def marcar_alerta_leida(alerta_id):
     """Marcar una alerta como leída"""
-    conn = get_connection()
+    with write_connection() as conn:
+        if conn:
+            try:
+                sql = "UPDATE alertas SET leida=TRUE WHERE id=?"
+                cursor = conn.cursor()
+                cursor.execute(sql, (alerta_id,))
+                conn.commit()
+                return True
+            except Error as e:
+                print(f"Error al marcar alerta como leída: {e}")
+                return False
+
+def get_estadisticas_alertas(simbolo=None):
+    """
+    Estadísticas de alertas de un símbolo o de todas: una sola fila de
+    alertas_resumen (los triggers la mantienen al día; incluye las archivadas)
+    """
+    conn = get_read_connection()
     if conn:
         try:
-            sql = "UPDATE alertas SET leida=TRUE WHERE id=?"
             cursor = conn.cursor()
-            cursor.execute(sql, (alerta_id,))
-            conn.commit()
+            cursor.execute("SELECT total, no_leidas, archivadas, ultima_alerta FROM alertas_resumen WHERE simbolo=?",
+                           (simbolo or ALERTAS_TOTAL,))
+            row = cursor.fetchone()
+            if row:
+                return {
+                    'total': row[0],
+                    'no_leidas': row[1],
+                    'archivadas': row[2],
+                    'ultima_alerta': row[3]
+                }
+        except Error as e:
+            print(f"Error al obtener estadísticas de alertas: {e}")
+    return {'total': 0, 'no_leidas': 0, 'archivadas': 0, 'ultima_alerta': None}
+
+# Retención de alertas: las leídas con más de ALERT_RETENTION_DAYS días pasan a
+# alertas_archivo y se acumulan en alertas_diarias (simbolo, tipo, día), así la
+# tabla alertas solo conserva las recientes y las no leídas
+
+ALERT_RETENTION_DAYS = 90
+# Páginas liberadas por llamada a PRAGMA incremental_vacuum
+ALERT_VACUUM_PAGES = 2000
+
+def habilitar_vacuum_incremental():
+    """
+    Mantenimiento explícito: convertir una base creada sin auto_vacuum
+    incremental. Requiere un VACUUM completo (bloquea y reescribe el
+    archivo), por eso no se llama desde la retención periódica
+    """
+    with write_connection() as conn:
+        if not conn:
+            return False
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return True
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            print("Base de datos compactada (auto_vacuum incremental habilitado)")
             return True
         except Error as e:
-            print(f"Error al marcar alerta como leída: {e}")
+            print(f"Error al compactar la base de datos: {e}")
             return False
 
-def get_estadisticas_alertas():
-    """Obtener estadísticas de alertas"""
-    conn = get_connection()
+def archivar_alertas(dias=ALERT_RETENTION_DAYS, paginas_vacuum=ALERT_VACUUM_PAGES):
+    """
+    Mover a alertas_archivo las alertas leídas con más de dias días, sumar
+    sus conteos diarios y liberar hasta paginas_vacuum páginas del archivo.
+    Devuelve cuántas alertas se archivaron (None si hubo error)
+    """
+    with write_connection() as conn:
+        if not conn:
+            return None
+        try:
+            # Un solo límite para las tres sentencias ('now' cambia entre ellas)
+            condicion = "leida=TRUE AND fecha < ?"
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            limite = cursor.execute("SELECT datetime('now', ?)", (f"-{int(dias)} days",)).fetchone()
+            cursor.execute(f"""
+            INSERT INTO alertas_diarias (simbolo, tipo_alerta, fecha, total)
+            SELECT simbolo, tipo_alerta, date(fecha), COUNT(*) FROM alertas
+            WHERE {condicion}
+            GROUP BY simbolo, tipo_alerta, date(fecha)
+            ON CONFLICT(simbolo, tipo_alerta, fecha) DO UPDATE SET total = total + excluded.total""", limite)
+            cursor.execute(f"INSERT INTO alertas_archivo SELECT * FROM alertas WHERE {condicion}", limite)
+            cursor.execute(f"DELETE FROM alertas WHERE {condicion}", limite)
+            archivadas = cursor.rowcount
+            conn.commit()
+
+            # Compactación por partes (solo si la base tiene auto_vacuum incremental)
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                conn.execute(f"PRAGMA incremental_vacuum({int(paginas_vacuum)})").fetchall()
+            if archivadas:
+                print(f"Alertas archivadas: {archivadas}")
+            return archivadas
+        except Error as e:
+            print(f"Error al archivar alertas: {e}")
+            return None
+
+# Lectura paginada (keyset): cada página es una consulta corta con LIMIT que
+# continúa después de la última clave leída, sin OFFSET ni cargar toda la tabla
+
+DEFAULT_PAGE_SIZE = 1000
+
+def _iter_keyset(table, keys, where=(), params=(), page_size=DEFAULT_PAGE_SIZE, descending=False):
+    """
+    Filas de table ordenadas por keys (columnas únicas en conjunto), de
+    page_size en page_size. keys: [(columna, posición en SELECT *)]
+    """
+    direction = "DESC" if descending else "ASC"
+    operator = "<" if descending else ">"
+    columns = ", ".join(column for column, position in keys)
+    order = ", ".join(f"{column} {direction}" for column, position in keys)
+    last = None
+
+    while True:
+        conn = get_read_connection()
+        if not conn:
+            return
+
+        clauses = list(where)
+        args = list(params)
+        if last is not None:
+            clauses.append(f"({columns}) {operator} ({', '.join('?' * len(keys))})")
+            args.extend(last)
+        sql = f"SELECT * FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order} LIMIT ?"
+
+        try:
+            rows = conn.execute(sql, args + [page_size]).fetchall()
+        except Error as e:
+            print(f"Error al leer {table}: {e}")
+            return
+
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last = [rows[-1][position] for column, position in keys]
+
+def iter_transacciones(simbolo=None, page_size=DEFAULT_PAGE_SIZE, descending=False):
+    """Transacciones por (fecha, id) sin cargarlas todas en memoria"""
+    where, params = (["simbolo = ?"], [simbolo]) if simbolo else ([], [])
+    return _iter_keyset("transacciones", [("fecha", 1), ("id", 0)], where, params, page_size, descending)
+
+def iter_alertas(simbolo=None, no_leidas=False, page_size=DEFAULT_PAGE_SIZE):
+    """Alertas de la más reciente a la más antigua, por páginas"""
+    where, params = [], []
+    if simbolo:
+        where.append("simbolo = ?")
+        params.append(simbolo)
+    if no_leidas:
+        where.append("leida = FALSE")
+    return _iter_keyset("alertas", [("fecha", 1), ("id", 0)], where, params, page_size, descending=True)
+
+def iter_activos(page_size=DEFAULT_PAGE_SIZE):
+    """Activos por id, por páginas"""
+    return _iter_keyset("activos", [("id", 0)], page_size=page_size)
+
+def count_transacciones(simbolo=None):
+    """Número de transacciones (se lee de posiciones, no recorre la tabla)"""
+    conn = get_read_connection()
     if conn:
         try:
             cursor = conn.cursor()
-            
-            # Total de alertas
-            cursor.execute("SELECT COUNT(*) FROM alertas")
-            total = cursor.fetchone()[0]
-            
-            # Alertas no leídas
-            cursor.execute("SELECT COUNT(*) FROM alertas WHERE leida=FALSE")
-            no_leidas = cursor.fetchone()[0]
-            
-            # Última alerta
-            cursor.execute("SELECT MAX(fecha) FROM alertas")
-            ultima_alerta = cursor.fetchone()[0]
-            
-            return {
-                'total': total,
-                'no_leidas': no_leidas,
-                'ultima_alerta': ultima_alerta
-            }
+            if simbolo:
+                cursor.execute("SELECT num_transacciones FROM posiciones WHERE simbolo = ?", (simbolo,))
+                row = cursor.fetchone()
+                return row[0] if row else 0
+            cursor.execute("SELECT COALESCE(SUM(num_transacciones), 0) FROM posiciones")
+            return cursor.fetchone()[0]
         except Error as e:
-            print(f"Error al obtener estadísticas de alertas: {e}")
-            return {'total': 0, 'no_leidas': 0, 'ultima_alerta': None}
+            print(f"Error al contar transacciones: {e}")
+            return 0
+
+def count_alertas(simbolo=None, no_leidas=False):
+    """Número de alertas (COUNT sobre los índices de alertas)"""
+    conn = get_read_connection()
+    if conn:
+        try:
+            where, params = [], []
+            if simbolo:
+                where.append("simbolo = ?")
+                params.append(simbolo)
+            if no_leidas:
+                where.append("leida = FALSE")
+            sql = "SELECT COUNT(*) FROM alertas"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            return conn.execute(sql, params).fetchone()[0]
+        except Error as e:
+            print(f"Error al contar alertas: {e}")
+            return 0
+
+def count_activos():
+    conn = get_read_connection()
+    if conn:
+        try:
+            return conn.execute("SELECT COUNT(*) FROM activos").fetchone()[0]
+        except Error as e:
+            print(f"Error al contar activos: {e}")
+            return 0
+
+# Valuaciones diarias: una fila por día y símbolo más el total del portafolio
+# (simbolo = VALUACION_TOTAL). Se llenan repitiendo las transacciones contra
+# los cierres diarios del almacén de históricos
+
+VALUACION_TOTAL = "_TOTAL"
+
+def _history_period(start):
+    """Periodo de Yahoo Finance más corto que cubre desde start hasta hoy"""
+    from api.providers import PERIOD_DAYS
+
+    days = (date.today() - start.date()).days + 7
+    for period, period_days in sorted(PERIOD_DAYS.items(), key=lambda item: item[1]):
+        if period_days >= days and period not in ("1d", "5d"):
+            return period
+    return "max"
+
+def _daily_closes(symbols, dates):
+    """Matriz fechas x símbolos de cierres diarios (moneda nativa), rellenada hacia adelante"""
+    import pandas as pd
+    from api.yahoo_finance import yahoo_api, _to_daily_index
+
+    period = _history_period(dates[0])
+    columns = {}
+    for symbol in symbols:
+        if not yahoo_api.is_polled(symbol):
+            continue
+        try:
+            hist = yahoo_api.get_history(symbol, period, "1d")
+        except Exception as e:
+            print(f"Sin cierres diarios para {symbol}: {e}")
+            continue
+        if hist is None or hist.empty:
+            continue
+        closes = hist['Close'].dropna()
+        closes.index = _to_daily_index(closes.index)
+        columns[symbol] = closes[~closes.index.duplicated(keep='last')]
+
+    closes = pd.DataFrame(columns, columns=symbols, dtype=float)
+    return closes.reindex(closes.index.union(dates)).ffill().reindex(dates)
+
+def _fx_to_usd(symbols, dates):
+    """Matriz fechas x símbolos con las unidades de moneda nativa por 1 USD"""
+    import pandas as pd
+    from api.yahoo_finance import yahoo_api
+
+    natives = {symbol: yahoo_api.fx.get_native_currency(symbol) for symbol in symbols}
+    rates = pd.DataFrame(1.0, index=dates, columns=symbols)
+    for currency in set(natives.values()) - {"USD"}:
+        aligned = _fx_usd_series(currency, dates)
+        for symbol, native in natives.items():
+            if native == currency:
+                rates[symbol] = aligned.to_numpy()
+    # Precios en subunidades (GBp, ZAc, ...): más unidades por 1 USD
+    scales = [yahoo_api.fx.get_unit_scale(symbol) for symbol in symbols]
+    return rates / scales
+
+def _fx_usd_series(currency, dates):
+    """Unidades de currency por 1 USD en cada fecha (cierre anterior si no hubo cotización)"""
+    import pandas as pd
+    from api.yahoo_finance import yahoo_api, get_fx_series
+    from api.fx_service import fx_pair
+
+    if currency.upper() == "USD":
+        return pd.Series(1.0, index=dates)
+    series = get_fx_series(_history_period(dates[0]), fx_pair(currency))
+    if series is None or series.empty:
+        # Sin tasa (None) el valor en USD queda vacío en lugar de asumir 1
+        rate = yahoo_api.fx.get_rate("USD", currency)
+        return pd.Series(float('nan') if rate is None else rate, index=dates)
+    return series.reindex(series.index.union(dates)).ffill().bfill().reindex(dates)
+
+def _valuar(start, end, transacciones, base=None):
+    """
+    Filas de valuaciones de start a end (inclusive). transacciones:
+    DataFrame (fecha, simbolo, cantidad, inversion) posteriores a la base;
+    base: DataFrame indexado por símbolo con cantidad e inversion al inicio.
+    Todo el cálculo es matricial: posiciones acumuladas x matriz de precios
+    """
+    import numpy as np
+    import pandas as pd
+
+    dates = pd.date_range(start, end, freq='D')
+    base = base if base is not None else pd.DataFrame(columns=['cantidad', 'inversion'], dtype=float)
+    symbols = sorted(set(base.index) | set(transacciones['simbolo']))
+    if len(dates) == 0:
+        return []
+    if not symbols:
+        # Sin posiciones el total vale 0, pero la serie sigue teniendo esos días
+        return [(VALUACION_TOTAL, fecha, 0.0, None, 0.0, 0.0, 0.0) for fecha in dates.strftime('%Y-%m-%d')]
+
+    def acumulado(column):
+        deltas = transacciones.pivot_table(index='fecha', columns='simbolo', values=column, aggfunc='sum')
+        deltas = deltas.reindex(index=dates, columns=symbols, fill_value=0.0).fillna(0.0)
+        return deltas.cumsum() + base[column].reindex(symbols).fillna(0.0).to_numpy()
+
+    cantidades = acumulado('cantidad')
+    inversiones = acumulado('inversion')
+
+    # Sin cotización (renta fija o antes del primer cierre) se valúa al costo
+    abiertas = cantidades.abs() > POSITION_EPSILON
+    costo = (inversiones / cantidades.where(abiertas)).replace([np.inf, -np.inf], np.nan)
+    precios = _daily_closes(symbols, dates)
+    precios = precios.where(precios.notna(), costo)
+
+    valores = (cantidades * precios).where(abiertas, 0.0).fillna(0.0)
+    tasas = _fx_to_usd(symbols, dates)
+    valores_usd = valores / tasas
+
+    fechas = dates.strftime('%Y-%m-%d')
+    filas = []
+    # Sin tipo de cambio (valor_usd vacío) no se guarda la fila del símbolo
+    mask = abiertas.to_numpy() & valores_usd.notna().to_numpy()
+    for i, j in zip(*np.nonzero(mask)):
+        filas.append((symbols[j], fechas[i], float(cantidades.iat[i, j]),
+                      None if pd.isna(precios.iat[i, j]) else float(precios.iat[i, j]),
+                      float(valores.iat[i, j]), float(inversiones.iat[i, j]), float(valores_usd.iat[i, j])))
+
+    # El total se guarda en USD (valor e inversión)
+    totales = zip(fechas, (inversiones.where(abiertas, 0.0) / tasas).sum(axis=1), valores_usd.sum(axis=1))
+    filas.extend((VALUACION_TOTAL, fecha, 0.0, None, float(valor_usd), float(inversion), float(valor_usd))
+                 for fecha, inversion, valor_usd in totales)
+    return filas
+
+def _read_transacciones_frame(conn, desde=None):
+    import pandas as pd
+
+    sql = "SELECT fecha, simbolo, cantidad, precio * cantidad AS inversion FROM transacciones"
+    params = ()
+    if desde is not None:
+        sql += " WHERE fecha > ?"
+        params = (desde,)
+    frame = pd.read_sql_query(sql, conn, params=params)
+    frame['fecha'] = pd.to_datetime(frame['fecha'], errors='coerce').dt.normalize()
+    return frame.dropna(subset=['fecha'])
+
+def _save_valuaciones(filas, desde):
+    with write_connection() as conn:
+        if conn:
+            try:
+                conn.execute("DELETE FROM valuaciones WHERE fecha >= ?", (desde,))
+                conn.executemany("""INSERT OR REPLACE INTO valuaciones
+                                    (simbolo, fecha, cantidad, precio, valor, inversion, valor_usd)
+                                    VALUES(?,?,?,?,?,?,?)""", filas)
+                conn.commit()
+                return True
+            except Error as e:
+                print(f"Error al guardar valuaciones: {e}")
+                return False
+
+def backfill_valuaciones():
+    """Recalcular todas las valuaciones diarias desde la primera transacción"""
+    import pandas as pd
+
+    conn = get_read_connection()
+    if not conn:
+        return 0
+    try:
+        transacciones = _read_transacciones_frame(conn)
+    except Error as e:
+        print(f"Error al leer transacciones: {e}")
+        return 0
+    if transacciones.empty:
+        return 0
+
+    start = transacciones['fecha'].min()
+    filas = _valuar(start, pd.Timestamp.today().normalize(), transacciones)
+    _save_valuaciones(filas, start.strftime('%Y-%m-%d'))
+    print(f"Valuaciones calculadas: {len(filas)} filas desde {start.date()}")
+    return len(filas)
+
+def extend_valuaciones():
+    """
+    Extender las valuaciones hasta hoy a partir de la última foto guardada:
+    la última fecha se recalcula (su cierre pudo cambiar) y solo se leen las
+    transacciones posteriores. Sin fotos previas se hace el cálculo completo
+    """
+    import pandas as pd
+
+    conn = get_read_connection()
+    if not conn:
+        return 0
+    try:
+        row = conn.execute("SELECT MAX(fecha) FROM valuaciones WHERE simbolo = ?", (VALUACION_TOTAL,)).fetchone()
+        last = row[0] if row else None
+        if last is None:
+            return backfill_valuaciones()
+
+        today = pd.Timestamp.today().normalize()
+        if last >= today.strftime('%Y-%m-%d'):
+            return 0
+
+        # Acumulado de todos los símbolos hasta last, incluidas las posiciones
+        # cerradas (su inversión sobrante sigue contando si se reabren)
+        base = pd.read_sql_query(
+            """SELECT simbolo, SUM(cantidad) AS cantidad, SUM(precio * cantidad) AS inversion
+               FROM transacciones WHERE fecha <= ? GROUP BY simbolo""",
+            conn, params=(last,), index_col='simbolo')
+        transacciones = _read_transacciones_frame(conn, last)
+    except Error as e:
+        print(f"Error al leer valuaciones: {e}")
+        return 0
+
+    filas = _valuar(pd.Timestamp(last), today, transacciones, base)
+    if not filas:
+        # Nunca se borra lo guardado sin algo con qué reemplazarlo
+        return 0
+    _save_valuaciones(filas, last)
+    return len(filas)
+
+def get_valuaciones(simbolo=VALUACION_TOTAL, desde=None, hasta=None):
+    """
+    Serie diaria guardada de un símbolo (o del total del portafolio):
+    [(fecha, cantidad, precio, valor, inversion, valor_usd)]
+    """
+    conn = get_read_connection()
+    if conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""SELECT fecha, cantidad, precio, valor, inversion, valor_usd
+                              FROM valuaciones
+                              WHERE simbolo = ? AND fecha >= ? AND fecha <= ?
+                              ORDER BY fecha""",
+                           (simbolo, desde or '0000-00-00', hasta or '9999-99-99'))
+            return cursor.fetchall()
+        except Error as e:
+            print(f"Error al obtener valuaciones: {e}")
+            return []
+
+def get_valor_portafolio(moneda="USD", desde=None, hasta=None):
+    """
+    Valor total diario del portafolio en moneda: [(fecha, valor)]. Cada día
+    se convierte con el tipo de cambio de ese día, no con el actual
+    """
+    import pandas as pd
+
+    rows = get_valuaciones(desde=desde, hasta=hasta)
+    if not rows:
+        return []
+    dates = pd.DatetimeIndex([row[0] for row in rows])
+    rates = _fx_usd_series(moneda, dates).to_numpy()
+    return [(row[0], row[5] * rate) for row, rate in zip(rows, rates)]
 
-if __name__ == "__main__":
-    create_tables()
-else:
-    create_tables()
\ No newline at end of file
+# Al importar solo se aplican las migraciones pendientes
+migrate()
\ No newline at end of file
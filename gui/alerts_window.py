@@ -1,13 +1,17 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                              QLabel, QTableWidget, QTableWidgetItem, QHeaderView,
                              QMessageBox, QComboBox, QGroupBox)
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, pyqtSignal
 from alerts.alert_manager import alert_manager
 from api.yahoo_finance import get_alert_conditions
+from api.quote_poller import quote_poller
 from datetime import datetime
 from PyQt5.QtGui import QColor
 
 class AlertsWindow(QWidget):
+    # Eventos del poller de precios (llegan desde su hilo)
+    prices_updated = pyqtSignal(dict)
+
     def __init__(self, portfolio_symbols):
         super().__init__()
         self.portfolio_symbols = portfolio_symbols
@@ -15,6 +19,18 @@ class AlertsWindow(QWidget):
         self.setGeometry(300, 300, 800, 600)
         self.init_ui()
         
+        # Refrescar el símbolo mostrado cuando el poller publique un precio nuevo
+        self.prices_updated.connect(self.on_prices_updated)
+        self._price_subscriber = quote_poller.subscribe(self.prices_updated.emit)
+    
+    def on_prices_updated(self, event):
+        if self.symbol_combo.currentText() in event['changed']:
+            self.update_alert_display()
+    
+    def closeEvent(self, event):
+        quote_poller.unsubscribe(self._price_subscriber)
+        event.accept()
+        
     def init_ui(self):
         layout = QVBoxLayout(self)
         
@@ -136,8 +152,8 @@ class AlertsWindow(QWidget):
     def update_alert_display(self):
         symbol = self.symbol_combo.currentText()
         
-        # Obtener condiciones actuales
-        conditions = get_alert_conditions(symbol)
+        # Obtener condiciones actuales con el último precio publicado
+        conditions = get_alert_conditions(symbol, current_price=quote_poller.get_last_price(symbol))
         
         if conditions:
             alert_text = f"{symbol}: ${conditions['current_price']:.2f} | "
@@ -218,7 +234,7 @@ class AlertsWindow(QWidget):
             self.alerts_table.setItem(0, 0, error_item)
     
     def check_all_alerts(self):
-        alerts = alert_manager.check_portfolio_alerts(self.portfolio_symbols)
+        alerts = alert_manager.check_portfolio_alerts(self.portfolio_symbols, quote_poller.get_last_prices())
         
         if alerts:
             messages = [alert['alert_message'] for alert in alerts]
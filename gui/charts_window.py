@@ -7,7 +7,6 @@ import webbrowser
 import os
 from datetime import datetime
 import pandas as pd
-import numpy as np
 
 from charts.plotly_charts import tech_charts
 from api.yahoo_finance import get_historical_data
@@ -163,7 +162,6 @@ class ChartsWindow(QWidget):
             self.info_label.setText("📊 Generando gráfico de rendimiento...")
             QApplication.processEvents()
             
-            # Datos de ejemplo - deberías implementar histórico real
             portfolio_history = self.get_portfolio_history()
             fig = tech_charts.create_portfolio_performance_chart(portfolio_history)
             
@@ -198,15 +196,19 @@ class ChartsWindow(QWidget):
             self.info_label.setText("❌ Error al generar gráfico de distribución.")
             print(f"Error en show_allocation_chart: {e}")
     
-    def get_portfolio_history(self):
-        """Simular datos históricos del portafolio"""
-        dates = pd.date_range(end=datetime.now(), periods=30, freq='D')
-        
-        # Simular crecimiento basado en los datos actuales
-        current_value = sum(asset['current_value'] for asset in self.portfolio_data)
-        values = np.linspace(current_value * 0.8, current_value, 30)
-        
-        return pd.DataFrame({'date': dates, 'value': values})
+    def get_portfolio_history(self, days=None):
+        """Valor diario del portafolio desde la tabla valuaciones (en la moneda configurada)"""
+        from database import get_valor_portafolio
+        from config.currency_config import currency_config
+        
+        # Las fotos diarias las extiende el poller de precios; aquí solo se leen
+        desde = (datetime.now() - pd.Timedelta(days=days)).strftime('%Y-%m-%d') if days else None
+        rows = get_valor_portafolio(currency_config.get_currency(), desde=desde)
+        
+        return pd.DataFrame({
+            'date': pd.to_datetime([row[0] for row in rows]),
+            'value': [row[1] for row in rows]
+        })
     
     def open_charts_folder(self):
         """Abrir carpeta con gráficos generados"""
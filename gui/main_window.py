@@ -3,14 +3,16 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem,
                              QLabel, QLineEdit, QDateEdit, QComboBox, QTabWidget,
                              QMessageBox, QHeaderView, QFormLayout, QGroupBox,
-                             QProgressBar)
-from PyQt5.QtCore import QDate, Qt
+                             QProgressBar, QFileDialog)
+from PyQt5.QtCore import QDate, Qt, pyqtSignal
 from PyQt5.QtGui import QFont
 from PyQt5.QtCore import QTimer
 from PyQt5.QtGui import QColor
-from api.yahoo_finance import get_current_price, validate_symbol
+from api.yahoo_finance import yahoo_api, get_current_price, validate_symbol, get_asset_name
+from api.quote_poller import quote_poller
 import sqlite3
 import os
+from itertools import islice
 import sys
 from alerts.alert_manager import alert_manager
 from PyQt5.QtCore import QTimer
@@ -19,9 +21,13 @@ from config.currency_config import currency_config
 
 # Añadir el directorio padre al path para importar database.py
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from database import get_connection,insert_activo,insert_transaccion,get_transacciones,close_connection
+from database import insert_activo,insert_transaccion,get_transacciones,close_connection
 
 class MainWindow(QMainWindow):
+    # Eventos del poller de precios (llegan desde su hilo)
+    prices_updated = pyqtSignal(dict)
+    alerts_triggered = pyqtSignal(list)
+
     def __init__(self):
         super().__init__()
         print("DEBUG: MainWindow inicializando")
@@ -66,10 +72,9 @@ class MainWindow(QMainWindow):
         self.tabs.addTab(self.forecast_tab, "Pronósticos")
         self.setup_forecast_tab()
 
-        # Timer para alertas automáticas
-        self.alert_timer = QTimer()
-        self.alert_timer.timeout.connect(self.check_alerts)
-        self.alert_timer.start(300000)  # 5 minutos
+        # Precios en segundo plano: el poller publica y la ventana reacciona
+        self.prices_updated.connect(self.on_prices_updated)
+        self.alerts_triggered.connect(self.show_alerts)
 
         self.alert_label = None
 
@@ -79,16 +84,23 @@ class MainWindow(QMainWindow):
         self.load_portfolio()
         print("DEBUG: Datos iniciales cargados")
 
-        # Verificar alertas iniciales
-        QTimer.singleShot(5000, self.check_alerts)  # Verificar después de 5 segundos
-
         print("DEBUG: Tema oscuro aplicado correctamente")
         print("DEBUG: Stylesheet length:", len(self.styleSheet()))
 
         self.alert_label = None  # Para el label de alertas
 
-        # Verificar alertas iniciales
-        QTimer.singleShot(5000, self.check_alerts)  # Verificar después de 5 segundos
+        # El primer ciclo del poller verifica las alertas iniciales
+        from database import get_all_symbols, extend_valuaciones
+        quote_poller.watch(get_all_symbols())
+        self._price_subscriber = quote_poller.subscribe(self.prices_updated.emit)
+        # Las alertas se revisan en el hilo del poller; la ventana solo recibe el resultado
+        self._alerts_listener = alert_manager.add_listener(self.alerts_triggered.emit)
+        quote_poller.subscribe(alert_manager.on_price_update)
+        # Archivar alertas leídas antiguas desde el hilo del poller (una vez al día)
+        quote_poller.subscribe(alert_manager.run_retention)
+        # Extender las valuaciones diarias (solo calcula si falta el día de hoy)
+        self._valuation_subscriber = quote_poller.subscribe(lambda event: extend_valuaciones())
+        quote_poller.start()
         QTimer.singleShot(6000, self.update_alert_stats)  # Actualizar stats después de 6 segundos
     
     def setup_transactions_tab(self):
@@ -122,6 +134,10 @@ class MainWindow(QMainWindow):
         self.add_btn.clicked.connect(self.add_transaction)
         form_layout.addRow("", self.add_btn)
         
+        self.import_btn = QPushButton("Importar CSV...")
+        self.import_btn.clicked.connect(self.import_transactions_csv)
+        form_layout.addRow("", self.import_btn)
+        
         form_group.setLayout(form_layout)
         layout.addWidget(form_group)
         
@@ -134,7 +150,13 @@ class MainWindow(QMainWindow):
         header = self.transactions_table.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.Stretch)
         
-        layout.addWidget(QLabel("Historial de Transacciones:"))
+        # Las transacciones se cargan por páginas al desplazarse hacia abajo
+        self.transactions_page_size = 500
+        self._transactions_pages = None
+        self.transactions_table.verticalScrollBar().valueChanged.connect(self.on_transactions_scrolled)
+        
+        self.transactions_label = QLabel("Historial de Transacciones:")
+        layout.addWidget(self.transactions_label)
         layout.addWidget(self.transactions_table)
     
     def setup_portfolio_tab(self):
@@ -182,8 +204,8 @@ class MainWindow(QMainWindow):
         currency_layout.addWidget(QLabel("Moneda:"))
         
         self.currency_combo = QComboBox()
-        self.currency_combo.addItems(["MXN - Pesos Mexicanos", "USD - Dólares Americanos"])
-        self.currency_combo.setCurrentText("MXN - Pesos Mexicanos" if currency_config.get_currency() == "MXN" else "USD - Dólares Americanos")
+        self.currency_combo.addItems(["MXN - Pesos Mexicanos", "USD - Dólares Americanos", "EUR - Euros"])
+        self.currency_combo.setCurrentText(f"{currency_config.get_currency()} - {currency_config.get_currency_name()}")
         self.currency_combo.currentTextChanged.connect(self.change_currency)
         currency_layout.addWidget(self.currency_combo)
         
@@ -254,7 +276,7 @@ class MainWindow(QMainWindow):
     
     def change_currency(self, currency_text):
         """Cambiar la moneda de visualización"""
-        currency = "MXN" if "MXN" in currency_text else "USD"
+        currency = currency_text.split(" - ")[0]
         if currency_config.set_currency(currency):
             self.load_portfolio()  # Recargar con la nueva moneda
     
@@ -411,7 +433,7 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Error", "Por favor ingresa valores numéricos válidos para precio, cantidad y comisiones.")
             return
         
-        if not symbol or not name:
+        if not symbol:
             QMessageBox.warning(self, "Error", "Por favor ingresa símbolo y nombre.")
             return
         
@@ -421,13 +443,19 @@ class MainWindow(QMainWindow):
                                          QMessageBox.Yes | QMessageBox.No)
             if reply == QMessageBox.No:
                 return
+        
+        # Si no se escribió nombre se toma de la metadata en cache
+        if not name:
+            name = get_asset_name(symbol)
+        if not name:
+            QMessageBox.warning(self, "Error", "Por favor ingresa símbolo y nombre.")
+            return
 
         # Insertar en la base de datos
         try:
             # Primero verificar si el activo ya existe
-            from database import get_activos,insert_transaccion,insert_activo
-            activos = get_activos()
-            existe_activo = any(activo[1] == symbol for activo in activos)
+            from database import get_activo,insert_transaccion,insert_activo
+            existe_activo = get_activo(symbol) is not None
             
             #cursor = self.conn.cursor()
             #cursor.execute("SELECT id FROM activos WHERE simbolo = ?", (symbol,))
@@ -441,6 +469,7 @@ class MainWindow(QMainWindow):
             success = insert_transaccion(date, symbol, price, quantity, commission)
 
             if success:
+                quote_poller.watch([symbol])
             
                 # Limpiar formulario
                 self.symbol_input.clear()
@@ -460,14 +489,52 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al agregar transacción: {str(e)}")
     
+    def import_transactions_csv(self):
+        """Importar transacciones desde un CSV (fecha, simbolo, precio, cantidad, comisiones, nombre, tipo)"""
+        path, _ = QFileDialog.getOpenFileName(self, "Importar transacciones", "", "CSV (*.csv)")
+        if not path:
+            return
+        
+        try:
+            from database import import_transacciones_csv, get_all_symbols
+            insertadas, omitidas = import_transacciones_csv(path)
+            quote_poller.watch(get_all_symbols())
+            self.load_transactions()
+            self.load_portfolio()
+            QMessageBox.information(self, "Importación",
+                                    f"Transacciones importadas: {insertadas}\nFilas omitidas: {omitidas}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error al importar transacciones: {str(e)}")
+    
     def load_transactions(self):
+        """Mostrar la primera página de transacciones (las más recientes primero)"""
         try:
-            from database import get_transacciones
-            transactions = get_transacciones()
-            #transactions = get_transacciones(self.conn)
-            self.transactions_table.setRowCount(len(transactions))
+            from database import iter_transacciones, count_transacciones
+            self._transactions_pages = iter_transacciones(page_size=self.transactions_page_size, descending=True)
+            self.transactions_label.setText(f"Historial de Transacciones ({count_transacciones()}):")
+            self.transactions_table.setRowCount(0)
+            self.load_more_transactions()
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Error", f"Error al cargar transacciones: {str(e)}")
+    
+    def on_transactions_scrolled(self, value):
+        if value >= self.transactions_table.verticalScrollBar().maximum() - 5:
+            self.load_more_transactions()
+    
+    def load_more_transactions(self):
+        """Agregar la siguiente página de transacciones a la tabla"""
+        if self._transactions_pages is None:
+            return
+        
+        try:
+            transactions = list(islice(self._transactions_pages, self.transactions_page_size))
+            if len(transactions) < self.transactions_page_size:
+                self._transactions_pages = None
             
-            for row, transaction in enumerate(transactions):
+            start = self.transactions_table.rowCount()
+            self.transactions_table.setRowCount(start + len(transactions))
+            
+            for row, transaction in enumerate(transactions, start=start):
                 id, fecha, simbolo, precio, cantidad, comisiones = transaction
                 total = precio * cantidad
                 
@@ -618,8 +685,15 @@ class MainWindow(QMainWindow):
         self.charts_window.show()
     
     def closeEvent(self, event):
-        # Cerrar conexión a la base de datos al salir
+        # Detener el poller y cerrar conexión a la base de datos al salir
         from database import close_connection
+        quote_poller.unsubscribe(self._price_subscriber)
+        quote_poller.unsubscribe(alert_manager.run_retention)
+        quote_poller.unsubscribe(alert_manager.on_price_update)
+        alert_manager.remove_listener(self._alerts_listener)
+        quote_poller.unsubscribe(self._valuation_subscriber)
+        quote_poller.stop()
+        yahoo_api.close()
         close_connection()
         event.accept()
     
@@ -711,8 +785,15 @@ class MainWindow(QMainWindow):
         """
         self.setStyleSheet(dark_stylesheet)
 
+    def on_prices_updated(self, event):
+        """Nuevos precios del poller: refrescar el portafolio (las alertas llegan por alerts_triggered)"""
+        if not event['changed']:
+            return
+        
+        self.load_portfolio()
+    
     def check_alerts(self):
-        """Verificar y mostrar alertas automáticas"""
+        """Verificar y mostrar alertas con los últimos precios publicados"""
         try:
             from database import get_all_symbols
             from alerts.alert_manager import alert_manager
@@ -721,18 +802,20 @@ class MainWindow(QMainWindow):
             if not symbols:
                 return
             
-            alerts = alert_manager.check_portfolio_alerts(symbols)
-            
-            # Actualizar la pestaña de alertas
-            self.update_alerts_tab(alerts)
-            
-            # Mostrar notificación si hay alertas
-            if alerts:
-                self.show_alert_notification(alerts)
+            alerts = alert_manager.check_portfolio_alerts(symbols, quote_poller.get_last_prices())
+            self.show_alerts(alerts)
                 
         except Exception as e:
             print(f"Error verificando alertas: {e}")
     
+    def show_alerts(self, alerts):
+        # Actualizar la pestaña de alertas
+        self.update_alerts_tab(alerts)
+        
+        # Mostrar notificación si hay alertas
+        if alerts:
+            self.show_alert_notification(alerts)
+    
     def update_alerts_tab(self, alerts):
         """Actualizar la pestaña de alertas con la información más reciente"""
         if alerts:
@@ -766,18 +849,11 @@ class MainWindow(QMainWindow):
         """Actualizar estadísticas de alertas"""
         try:
             from alerts.alert_manager import alert_manager
-            from database import get_all_symbols
-            
-            symbols = get_all_symbols()
-            total_alerts = 0
-            last_alert = None
             
-            for symbol in symbols:
-                stats = alert_manager.get_alert_stats(symbol)
-                total_alerts += stats['total_alerts']
-                
-                if stats['last_alert'] and (not last_alert or stats['last_alert'] > last_alert):
-                    last_alert = stats['last_alert']
+            # Una sola fila de alertas_resumen; no hace falta el histórico
+            stats = alert_manager.get_alert_stats(history_limit=0)
+            total_alerts = stats['total_alerts']
+            last_alert = stats['last_alert']
             
             self.total_alerts_label.setText(f"Alertas totales: {total_alerts}")
             
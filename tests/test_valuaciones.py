@@ -0,0 +1,84 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# La base y los caches usan rutas relativas: todo se crea en un directorio temporal
+TMP_DIR = tempfile.mkdtemp()
+os.chdir(TMP_DIR)
+os.environ["TRADER_DB_PATH"] = os.path.join(TMP_DIR, "trader_test.db")
+os.environ["TRADER_PRICE_PROVIDER"] = "replay"
+os.environ["TRADER_REPLAY_DIR"] = TMP_DIR
+
+import database
+from api.yahoo_finance import yahoo_api
+
+SYMBOL = "SYMTEST"
+
+def tearDownModule():
+    database.close_connection()
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+class ValuacionesPosicionesCerradasTest(unittest.TestCase):
+
+    def setUp(self):
+        # Sin precios: el símbolo se valúa al costo y no se pide al proveedor
+        yahoo_api.negative_cache.add(SYMBOL, "símbolo de prueba")
+        with database.write_connection() as conn:
+            for table in ("transacciones", "posiciones", "valuaciones", "activos"):
+                conn.execute(f"DELETE FROM {table}")
+            conn.commit()
+        database.insert_activo(SYMBOL, SYMBOL, "accion")
+
+    def _dias(self, atras):
+        return (date.today() - timedelta(days=atras)).isoformat()
+
+    def test_extend_no_borra_historial_sin_posiciones(self):
+        database.insert_transaccion(self._dias(16), SYMBOL, 100.0, 10)
+        database.insert_transaccion(self._dias(10), SYMBOL, 120.0, -10)
+        database.backfill_valuaciones()
+        dias = len(database.get_valuaciones())
+        self.assertEqual(dias, 17)
+        # Como si la última foto fuera de ayer
+        with database.write_connection() as conn:
+            conn.execute("DELETE FROM valuaciones WHERE fecha = ?", (self._dias(0),))
+            conn.commit()
+
+        for _ in range(3):
+            database.extend_valuaciones()
+            self.assertEqual(len(database.get_valuaciones()), dias)
+
+    def test_extend_agrega_dias_en_cero_sin_posiciones(self):
+        database.insert_transaccion(self._dias(16), SYMBOL, 100.0, 10)
+        database.insert_transaccion(self._dias(10), SYMBOL, 120.0, -10)
+        database.backfill_valuaciones()
+        with database.write_connection() as conn:
+            conn.execute("DELETE FROM valuaciones WHERE fecha > ?", (self._dias(3),))
+            conn.commit()
+
+        database.extend_valuaciones()
+        filas = database.get_valuaciones(desde=self._dias(3))
+        self.assertEqual([fila[0] for fila in filas], [self._dias(d) for d in range(3, -1, -1)])
+        self.assertTrue(all(fila[5] == 0.0 for fila in filas))
+
+    def test_extend_conserva_inversion_de_posicion_reabierta(self):
+        database.insert_transaccion(self._dias(16), SYMBOL, 100.0, 10)
+        database.insert_transaccion(self._dias(10), SYMBOL, 120.0, -10)
+        database.backfill_valuaciones()
+        database.insert_transaccion(self._dias(1), SYMBOL, 50.0, 2)
+
+        database.extend_valuaciones()
+        extendida = database.get_valuaciones(SYMBOL, desde=self._dias(1))
+        database.backfill_valuaciones()
+        completa = database.get_valuaciones(SYMBOL, desde=self._dias(1))
+
+        self.assertEqual(extendida, completa)
+        self.assertAlmostEqual(extendida[-1][4], 100.0 * 10 - 120.0 * 10 + 50.0 * 2)
+
+if __name__ == "__main__":
+    unittest.main()